@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Intervalo padrão (em segundos) entre o início de dois ciclos de atualização de preços
+PRECOS_INTERVALO_SEGUNDOS = float(os.environ.get('PRECOS_INTERVALO_SEGUNDOS', 60))
+
+
+class AgendadorPrecos:
+    def __init__(self, executar_ciclo, intervalo_segundos=PRECOS_INTERVALO_SEGUNDOS, **parametros):
+        """
+        Executa ciclos de atualização de preços em uma thread própria, com cadência fixa
+
+        Os ciclos começam em instantes múltiplos do intervalo a partir do primeiro: o tempo
+        gasto em cada ciclo é descontado da espera, sem acumular atraso. Um ciclo que excede
+        o intervalo conta como atraso e os instantes já perdidos são pulados.
+
+        Args:
+            executar_ciclo (callable): Função chamada como executar_ciclo(prazo=intervalo, **parametros);
+                retorna as estatísticas do ciclo (atualizados, inalterados, erros)
+            intervalo_segundos (float): Intervalo entre o início de dois ciclos
+            **parametros: Parâmetros repassados a cada ciclo (ex.: api_url)
+        """
+        self.executar_ciclo = executar_ciclo
+        self.intervalo_segundos = intervalo_segundos
+        self.parametros = parametros
+
+        self._thread = None
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._lock = threading.Lock()
+        self._zerar_estatisticas()
+
+    def _zerar_estatisticas(self):
+        self.iniciado_em = None
+        self.proximo_ciclo_em = None
+        self.ciclos = 0
+        self.atrasos = 0
+        self.ciclos_pulados = 0
+        self.falhas = 0
+        self.sucessos = 0
+        self.erros = 0
+        self.ultimo_ciclo = None
+
+    @property
+    def em_execucao(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self, intervalo_segundos=None, **parametros):
+        """
+        Inicia o agendador; se já estiver em execução, apenas aplica a nova configuração
+
+        Se uma parada ainda aguarda o fim do ciclo em andamento, espera a thread antiga
+        terminar e inicia uma nova.
+
+        Returns:
+            bool: True se uma nova thread foi iniciada
+        """
+        self.reconfigurar(intervalo_segundos, **parametros)
+
+        with self._lock:
+            thread = self._thread
+            if self.em_execucao and not self._parar.is_set():
+                return False
+
+        if thread is not None:
+            thread.join()
+
+        with self._lock:
+            if self.em_execucao:
+                # Outra chamada a iniciar() venceu a disputa
+                return False
+
+            self._parar.clear()
+            self._acordar.clear()
+            self._zerar_estatisticas()
+            self.iniciado_em = datetime.now().isoformat()
+            self._thread = threading.Thread(target=self._loop, name='agendador-precos', daemon=True)
+            self._thread.start()
+            return True
+
+    def parar(self, timeout=None):
+        """
+        Interrompe o agendador (o ciclo em andamento termina normalmente)
+
+        Args:
+            timeout (float): Tempo máximo para aguardar o fim do ciclo em andamento; se vencer,
+                a thread termina sozinha ao fim do ciclo (em_execucao continua True até lá)
+
+        Returns:
+            bool: True se o agendador estava em execução
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return False
+            self._parar.set()
+            self._acordar.set()
+
+        thread.join(timeout)
+        with self._lock:
+            self.proximo_ciclo_em = None
+        return True
+
+    def reconfigurar(self, intervalo_segundos=None, **parametros):
+        """Altera o intervalo e/ou os parâmetros; a espera em curso é recalculada imediatamente"""
+        if intervalo_segundos is not None and intervalo_segundos <= 0:
+            raise ValueError("O intervalo deve ser positivo")
+
+        with self._lock:
+            if intervalo_segundos is not None:
+                self.intervalo_segundos = float(intervalo_segundos)
+            self.parametros.update({chave: valor for chave, valor in parametros.items() if valor is not None})
+        self._acordar.set()
+
+    def _loop(self):
+        proximo = time.monotonic()
+
+        while not self._parar.is_set():
+            with self._lock:
+                intervalo = self.intervalo_segundos
+                parametros = dict(self.parametros)
+
+            inicio = time.monotonic()
+            iniciado_em = datetime.now()
+            falha = None
+            try:
+                resultado = self.executar_ciclo(prazo=intervalo, **parametros) or {}
+            except Exception as e:
+                print(f"⚠️ Erro no ciclo de atualização de preços: {str(e)}")
+                resultado = {}
+                falha = str(e)
+            fim = time.monotonic()
+            duracao = fim - inicio
+
+            # Próximo instante da grade; os instantes que já passaram durante o ciclo são pulados
+            proximo += intervalo
+            pulados = 0
+            if fim > proximo:
+                pulados = int((fim - proximo) // intervalo) + 1
+                proximo += pulados * intervalo
+
+            with self._lock:
+                self.ciclos += 1
+                self.atrasos += 1 if duracao > intervalo else 0
+                self.ciclos_pulados += pulados
+                self.falhas += 1 if falha else 0
+                self.sucessos += resultado.get('atualizados', 0) + resultado.get('inalterados', 0)
+                self.erros += resultado.get('erros', 0)
+                self.ultimo_ciclo = dict(
+                    resultado,
+                    iniciado_em=iniciado_em.isoformat(),
+                    duracao_segundos=round(duracao, 3),
+                    excedeu_intervalo=duracao > intervalo,
+                    falha=falha
+                )
+
+            # Aguardar o próximo instante; parar/reconfigurar interrompem a espera
+            while not self._parar.is_set():
+                with self._lock:
+                    self.proximo_ciclo_em = (datetime.now() + timedelta(seconds=max(0.0, proximo - time.monotonic()))).isoformat()
+                espera = proximo - time.monotonic()
+                if espera <= 0 or not self._acordar.wait(espera):
+                    break
+
+                self._acordar.clear()
+                with self._lock:
+                    novo_intervalo = self.intervalo_segundos
+                if novo_intervalo != intervalo:
+                    # Nova grade a partir do início do último ciclo
+                    proximo = inicio + novo_intervalo
+                    intervalo = novo_intervalo
+
+    def estatisticas(self):
+        """Retorna o estado do agendador, os totais acumulados e as estatísticas do último ciclo"""
+        with self._lock:
+            return {
+                'em_execucao': self.em_execucao,
+                'intervalo_segundos': self.intervalo_segundos,
+                'parametros': dict(self.parametros),
+                'iniciado_em': self.iniciado_em,
+                'proximo_ciclo_em': self.proximo_ciclo_em if self.em_execucao else None,
+                'ciclos': self.ciclos,
+                'atrasos': self.atrasos,
+                'ciclos_pulados': self.ciclos_pulados,
+                'falhas': self.falhas,
+                'sucessos': self.sucessos,
+                'erros': self.erros,
+                'ultimo_ciclo': self.ultimo_ciclo
+            }
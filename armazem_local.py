@@ -0,0 +1,247 @@
+import os
+import json
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+
+# Diretório do armazém local de séries históricas (não definido = armazém desativado)
+ARMAZEM_LOCAL_DIR = os.environ.get('ARMAZEM_LOCAL_DIR')
+# Modo offline: as séries são lidas apenas do armazém local, sem consultar o Supabase
+ARMAZEM_LOCAL_OFFLINE = os.environ.get('ARMAZEM_LOCAL_OFFLINE', '').lower() in ('1', 'true', 'sim')
+# Intervalo (em segundos) entre verificações de registros novos no Supabase para cada ticker do armazém
+ARMAZEM_LOCAL_VERIFICACAO = int(os.environ.get('ARMAZEM_LOCAL_VERIFICACAO', 300))
+
+# Colunas numéricas de dados_historicos mantidas no armazém
+COLUNAS_NUMERICAS = ('abertura', 'maxima', 'minima', 'fechamento', 'retorno_diario', 'mm20', 'bb2s', 'bb2i')
+
+# Um registro por data: as colunas são campos de um array estruturado gravado em .npy
+TIPO_REGISTRO = np.dtype(
+    [('data', 'datetime64[D]'), ('id', 'i8')] + [(coluna, 'f8') for coluna in COLUNAS_NUMERICAS]
+)
+
+
+class ArmazemLocal:
+    def __init__(self, diretorio, offline=False, verificacao_segundos=ARMAZEM_LOCAL_VERIFICACAO):
+        """
+        Réplica local de dados_historicos com um arquivo .npy por ticker, lido por mapeamento
+        em memória (os recortes por data são visões do arquivo, sem cópia)
+
+        Args:
+            diretorio (str): Diretório dos arquivos
+            offline (bool): Se True, as leituras nunca recorrem ao Supabase
+            verificacao_segundos (int): Intervalo entre verificações de registros novos no
+                Supabase para cada ticker (gravações de processos sem o armazém)
+        """
+        self.diretorio = diretorio
+        self.offline = offline
+        self.verificacao_segundos = verificacao_segundos
+        # ticker -> instante (time.monotonic) da última verificação no Supabase
+        self._verificado_em = {}
+        os.makedirs(diretorio, exist_ok=True)
+
+        self._abertos = {}
+        self._lock = threading.Lock()
+        # ticker -> lock que serializa a leitura, mescla e gravação do arquivo do ticker
+        self._locks_gravacao = {}
+        self._caminho_indice = os.path.join(diretorio, 'indice.json')
+        self._indice = self._ler_indice()
+
+    def _ler_indice(self):
+        """Lê o índice (ticker -> nome do ativo, registros e última data)"""
+        try:
+            with open(self._caminho_indice, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _caminho(self, ticker):
+        return os.path.join(self.diretorio, quote(ticker, safe='') + '.npy')
+
+    def _abrir(self, ticker):
+        """Retorna o array mapeado em memória do ticker, reabrindo-o se o arquivo foi regravado"""
+        caminho = self._caminho(ticker)
+        try:
+            estado = os.stat(caminho)
+            # os.replace cria um novo inode a cada gravação
+            versao = (estado.st_ino, estado.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            aberto = self._abertos.get(ticker)
+            if aberto is not None and aberto[0] == versao:
+                return aberto[1]
+
+            registros = np.load(caminho, mmap_mode='r')
+            self._abertos[ticker] = (versao, registros)
+            return registros
+
+    def tickers(self):
+        """Lista os tickers presentes no armazém"""
+        with self._lock:
+            self._indice = self._ler_indice()
+            return list(self._indice.keys())
+
+    def ultima_data(self, ticker):
+        """Data do último registro local do ticker ('YYYY-MM-DD') ou None"""
+        registros = self._abrir(ticker)
+        if registros is None or len(registros) == 0:
+            return None
+        return str(registros['data'][-1])
+
+    def fatia(self, ticker, data_inicio=None, data_fim=None):
+        """
+        Recorta a série de um ticker por data sem copiar os dados
+
+        Args:
+            ticker (str): O ticker do ativo
+            data_inicio (str): Data inicial (YYYY-MM-DD), inclusiva
+            data_fim (str): Data final (YYYY-MM-DD), inclusiva
+
+        Returns:
+            numpy.ndarray: Visão do array estruturado (campos 'data' e colunas numéricas) ou None
+        """
+        registros = self._abrir(ticker)
+        if registros is None:
+            return None
+
+        datas = registros['data']
+        inicio = np.searchsorted(datas, np.datetime64(data_inicio, 'D')) if data_inicio else 0
+        fim = np.searchsorted(datas, np.datetime64(data_fim, 'D'), side='right') if data_fim else len(datas)
+        return registros[inicio:fim]
+
+    def carregar(self, ticker):
+        """
+        Carrega a série completa de um ticker no mesmo formato das consultas ao Supabase
+
+        Returns:
+            pandas.DataFrame: DataFrame indexado por data ou None se o ticker não estiver no armazém
+        """
+        registros = self.fatia(ticker)
+        if registros is None or len(registros) == 0:
+            return None
+        return self.para_dataframe(ticker, registros)
+
+    def para_dataframe(self, ticker, registros):
+        """
+        Converte um recorte retornado por fatia() em DataFrame indexado por data
+
+        Args:
+            ticker (str): O ticker do ativo
+            registros (numpy.ndarray): Recorte do array estruturado
+
+        Returns:
+            pandas.DataFrame: DataFrame com as colunas de dados_historicos
+        """
+        with self._lock:
+            nome_ativo = self._indice.get(ticker, {}).get('nome_ativo')
+
+        df = pd.DataFrame({coluna: registros[coluna] for coluna in COLUNAS_NUMERICAS})
+        df.insert(0, 'id', registros['id'])
+        df.insert(1, 'ticker', ticker)
+        df.insert(2, 'nome_ativo', nome_ativo)
+        df.index = pd.DatetimeIndex(registros['data'].astype('datetime64[ns]'), name='data')
+        return df
+
+    def gravar(self, ticker, dados):
+        """
+        Mescla novos registros à série local de um ticker (registros da mesma data são substituídos)
+
+        Args:
+            ticker (str): O ticker do ativo
+            dados (pandas.DataFrame): Registros de dados_historicos indexados por data
+
+        Returns:
+            int: Número total de registros do ticker no armazém
+        """
+        with self._lock:
+            lock_gravacao = self._locks_gravacao.setdefault(ticker, threading.Lock())
+
+        # Gravações simultâneas do mesmo ticker perderiam os registros mesclados uma da outra
+        with lock_gravacao:
+            return self._gravar(ticker, dados)
+
+    def _gravar(self, ticker, dados):
+        existentes = self._abrir(ticker)
+        if dados is None or dados.empty:
+            return len(existentes) if existentes is not None else 0
+
+        novos = np.empty(len(dados), dtype=TIPO_REGISTRO)
+        novos['data'] = pd.DatetimeIndex(dados.index).values.astype('datetime64[D]')
+        novos['id'] = pd.to_numeric(dados['id'], errors='coerce').fillna(-1).to_numpy(dtype='i8') \
+            if 'id' in dados.columns else -1
+        for coluna in COLUNAS_NUMERICAS:
+            novos[coluna] = pd.to_numeric(dados[coluna], errors='coerce').to_numpy(dtype=float) \
+                if coluna in dados.columns else np.nan
+
+        if existentes is not None and len(existentes):
+            # Manter os registros existentes cujas datas não foram reenviadas
+            mantidos = existentes[~np.isin(existentes['data'], novos['data'])]
+            novos = np.concatenate([np.asarray(mantidos), novos])
+
+        # Ordenar por data e descartar datas repetidas nos próprios novos registros (vale o último)
+        ordem = np.argsort(novos['data'], kind='stable')
+        novos = novos[ordem]
+        ultimos = np.append(novos['data'][1:] != novos['data'][:-1], True)
+        novos = novos[ultimos]
+
+        # Gravação atômica: leitores com o arquivo antigo mapeado continuam válidos
+        with self._arquivo_temporario('wb') as arquivo:
+            np.save(arquivo, novos)
+        os.replace(arquivo.name, self._caminho(ticker))
+
+        nome_ativo = None
+        if 'nome_ativo' in dados.columns and dados['nome_ativo'].notna().any():
+            nome_ativo = dados['nome_ativo'].dropna().iloc[-1]
+
+        with self._lock:
+            # Reler o índice para preservar entradas gravadas por outros processos (ex.: shards da ingestão)
+            self._indice = self._ler_indice()
+            entrada = self._indice.setdefault(ticker, {})
+            entrada['nome_ativo'] = nome_ativo or entrada.get('nome_ativo')
+            entrada['registros'] = int(len(novos))
+            entrada['ultima_data'] = str(novos['data'][-1])
+            self._salvar_indice()
+
+        return len(novos)
+
+    def verificacao_pendente(self, ticker):
+        """Verifica se o ticker está há mais de verificacao_segundos sem conferir registros novos no Supabase"""
+        if self.offline:
+            return False
+        with self._lock:
+            verificado_em = self._verificado_em.get(ticker)
+        return verificado_em is None or time.monotonic() - verificado_em >= self.verificacao_segundos
+
+    def marcar_verificado(self, tickers):
+        """Registra que os tickers foram conferidos com o Supabase agora"""
+        agora = time.monotonic()
+        with self._lock:
+            for ticker in tickers:
+                self._verificado_em[ticker] = agora
+
+    def _salvar_indice(self):
+        with self._arquivo_temporario('w', encoding='utf-8') as arquivo:
+            json.dump(self._indice, arquivo, ensure_ascii=False, indent=2)
+        os.replace(arquivo.name, self._caminho_indice)
+
+    def _arquivo_temporario(self, modo, **kwargs):
+        """Arquivo temporário com nome único no diretório do armazém (substituído depois com os.replace)"""
+        return tempfile.NamedTemporaryFile(modo, dir=self.diretorio, suffix='.tmp', delete=False, **kwargs)
+
+    def estatisticas(self):
+        """Retorna o diretório, o modo e o número de registros por ticker"""
+        with self._lock:
+            return {
+                'diretorio': self.diretorio,
+                'offline': self.offline,
+                'verificacao_segundos': self.verificacao_segundos,
+                'tickers': {ticker: entrada.get('registros') for ticker, entrada in self._indice.items()}
+            }
+
+
+# Instância compartilhada (None se ARMAZEM_LOCAL_DIR não estiver definido)
+armazem_local = ArmazemLocal(ARMAZEM_LOCAL_DIR, ARMAZEM_LOCAL_OFFLINE) if ARMAZEM_LOCAL_DIR else None
@@ -4,10 +4,14 @@ import logging
 import sys
 import os
 import argparse
-import requests
 from datetime import datetime
 from supabase import create_client
 from dotenv import load_dotenv
+from universo_ativos import UniversoAtivos
+from cliente_rtd import ClienteRTD
+from publicador_precos import PublicadorPrecos, PRECO_TOLERANCIA, PRECO_HEARTBEAT_SEGUNDOS
+from precos_intraday import PrecosIntraday
+from calendario_b3 import agora_b3, dia_de_pregao, em_pregao, proxima_abertura
 
 # Carregar variáveis do arquivo .env
 load_dotenv()
@@ -19,6 +23,9 @@ SUPABASE_KEY = os.environ.get('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXV
 # Configurações da API RTD
 RTD_API_URL = os.environ.get('RTD_API_URL', 'https://5831b94a860f.ngrok.app/api/MarketData')
 
+# Intervalo (em segundos) entre consultas de uma classe de ativo fora da sessão, no modo calendário
+INTERVALO_FORA_PREGAO = float(os.environ.get('INTERVALO_FORA_PREGAO', 900))
+
 # Configuração de logging
 LOG_FILENAME = "rtd_price_update.log"
 logging.basicConfig(
@@ -35,21 +42,41 @@ logger = logging.getLogger("atualizador_precos_rtd")
 
 
 class RTDUpdater:
-    def __init__(self, interval_seconds=60, timeout=20):
+    def __init__(self, interval_seconds=60, timeout=20, shard=None, total_shards=None,
+                 tolerancia=PRECO_TOLERANCIA, heartbeat_seconds=PRECO_HEARTBEAT_SEGUNDOS,
+                 calendario=False, intervalo_fora_pregao=INTERVALO_FORA_PREGAO):
         """
         Inicializa o atualizador de preços usando a API RTD
         
         Args:
             interval_seconds (int): Intervalo entre atualizações em segundos
             timeout (int): Tempo máximo para receber cotações em segundos
+            shard (int): Índice do shard do universo de ativos a atualizar (None = todos)
+            total_shards (int): Número total de shards
+            tolerancia (float): Variação relativa de preço abaixo da qual não há nova gravação
+            heartbeat_seconds (float): Intervalo para regravar preços inalterados
+            calendario (bool): Se True, segue o calendário da B3: consulta cada classe de ativo a
+                cada interval_seconds durante a sua sessão, a cada intervalo_fora_pregao fora
+                dela e não consulta em fins de semana e feriados
+            intervalo_fora_pregao (float): Intervalo entre consultas fora da sessão (modo calendário)
         """
         self.interval_seconds = interval_seconds
+        self.calendario = calendario
+        self.intervalo_fora_pregao = intervalo_fora_pregao
+        # Última consulta (time.monotonic) de cada classe de ativo, para as consultas fora da sessão
+        self._consultado_em = {}
         self.timeout = timeout
         self.api_url = RTD_API_URL
+        self.shard = shard
+        self.total_shards = total_shards
+        
+        # Cliente RTD com pool de conexões e concorrência limitada (fechado apenas em fechar())
+        self.cliente = ClienteRTD(self.api_url, timeout=timeout)
         
         # Inicializar variáveis
         self._running = False
         self._signal = threading.Event()
+        self._thread = None
         self._atualizacoes_recebidas = 0
         self._atualizacoes_esperadas = 0
         self._tempo_inicio = 0
@@ -63,52 +90,54 @@ class RTDUpdater:
             logger.error(f"Erro ao conectar com o Supabase: {str(e)}")
             self.supabase = None
             
-        # Dicionário para armazenar a correspondência entre tickers
+        # Universo de ativos (ticker RTD, fator de escala), mantido em cache
+        self.universo = UniversoAtivos(self.supabase) if self.supabase else None
+        
+        # Cotações do ciclo gravadas em lote, com um único upsert, omitindo preços inalterados
+        self.publicador = PublicadorPrecos(
+            self.supabase, tolerancia=tolerancia, heartbeat_segundos=heartbeat_seconds
+        ) if self.supabase else None
+        
+        # Histórico intradiário: todas as cotações consultadas, gravadas em lote a cada ciclo
+        self.intraday = PrecosIntraday(self.supabase) if self.supabase else None
+        
+        # Dicionários para armazenar a correspondência entre tickers e o fator de escala
         self.ticker_map = {}
+        self.fatores_escala = {}
         
-        # Carregar lista de ativos do banco de dados
-        self.ativos = []
+        # Carregar ativos do banco de dados (dicionário ticker -> ativo)
+        self.ativos = {}
         self.tickers_rtd = []
         self._load_ativos()
     
     def _load_ativos(self):
-        """Carrega a lista de ativos do banco de dados Supabase"""
-        if not self.supabase:
+        """Carrega a lista de ativos do universo (tabela 'ativos', com cache)"""
+        if not self.universo:
             logger.error("Supabase não inicializado. Não foi possível carregar ativos.")
             return
             
         try:
-            response = self.supabase.table('ativos').select('*').execute()
-            self.ativos = response.data
+            ativos = self.universo.ativos_rtd(self.shard, self.total_shards)
             
-            # Tabela de equivalência específica entre tickers do banco e tickers da API RTD
-            equivalencia_tickers = {
-                'BOVA11.SA': 'BOVA11',
-                'XFIX11.SA': 'XFIX11',
-                'IB5M11.SA': 'IB5M11',
-                'B5P211.SA': 'B5P211',
-                'FIXA11.SA': 'FIXA11',
-                'USDBRL=X': 'DOLCV'
-            }
+            # Preservar o último preço conhecido dos ativos já carregados
+            for ativo in ativos:
+                anterior = self.ativos.get(ativo['ticker'])
+                if anterior:
+                    ativo['preco_atual'] = anterior.get('preco_atual')
+                    ativo['data_atualizacao'] = anterior.get('data_atualizacao')
+            self.ativos = {ativo['ticker']: ativo for ativo in ativos}
             
             # Criar mapeamento para os tickers
-            for ativo in self.ativos:
-                ticker_banco = ativo['ticker']
-                # Usar a tabela de equivalência, se disponível
-                if ticker_banco in equivalencia_tickers:
-                    ticker_rtd = equivalencia_tickers[ticker_banco]
-                else:
-                    # Para outros casos, aplicar a regra geral (remover sufixos)
-                    ticker_rtd = ticker_banco.split('.')[0].replace('=', '')
+            self.ticker_map = {}
+            self.fatores_escala = {}
+            for ativo in ativos:
+                self.ticker_map[ativo['ticker_rtd']] = ativo['ticker']
+                self.fatores_escala[ativo['ticker']] = ativo['fator_escala']
                 
-                # Armazenar o mapeamento nos dois sentidos
-                self.ticker_map[ticker_rtd] = ticker_banco
+                logger.debug(f"Mapeamento: {ativo['ticker']} -> {ativo['ticker_rtd']}")
                 
-                logger.debug(f"Mapeamento: {ticker_banco} -> {ticker_rtd}")
-                
-            logger.info(f"Carregados {len(self.ativos)} ativos do banco de dados.")
+            logger.info(f"Carregados {len(self.ativos)} ativos do universo.")
             
-            # Filtrar tickers disponíveis (excluir CDI e USDBRL se necessário)
             self.tickers_rtd = list(self.ticker_map.keys())
             self._atualizacoes_esperadas = len(self.tickers_rtd)
             
@@ -121,19 +150,38 @@ class RTDUpdater:
             logger.warning("Atualizador já está em execução")
             return
             
+        # Um stop() anterior pode ter deixado o último ciclo em andamento
+        if self._thread is not None and self._thread.is_alive():
+            logger.info("Aguardando o fim do ciclo em andamento...")
+            self._thread.join()
+            
         self._running = True
+        self._signal.clear()
         
         logger.info(f"Iniciando loop de atualização a cada {self.interval_seconds} segundos")
         logger.info(f"Timeout para receber cotações: {self.timeout} segundos")
         
         # Iniciar o loop em uma thread separada
-        threading.Thread(target=self._update_loop).start()
+        self._thread = threading.Thread(target=self._update_loop)
+        self._thread.start()
     
-    def stop(self):
-        """Para o loop de atualização"""
+    def stop(self, timeout=None):
+        """
+        Para o loop de atualização
+        
+        Args:
+            timeout (float): Tempo máximo para aguardar o fim do ciclo em andamento (None = sem limite)
+        """
         self._running = False
         self._signal.set()
         logger.info("Parando atualizador...")
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def fechar(self):
+        """Para o loop e libera as conexões do cliente RTD (no encerramento do processo)"""
+        self.stop()
+        self.cliente.fechar()
 
     def _update_loop(self):
         """Loop de atualização de preços"""
@@ -141,24 +189,40 @@ class RTDUpdater:
             while self._running:
                 self._tempo_inicio = time.time()
                 now = time.strftime("%Y-%m-%d %H:%M:%S")
-                logger.info(f"Iniciando ciclo de atualização em {now}")
                 
                 self._atualizacoes_recebidas = 0
                 
-                self._solicitar_cotacoes()
+                # O universo só é relido do banco quando o cache expira
+                self._load_ativos()
                 
-                elapsed = time.time() - self._tempo_inicio
-                logger.info(f"Ciclo de atualização concluído em {elapsed:.1f} segundos")
-                logger.info(f"Atualizações recebidas: {self._atualizacoes_recebidas}/{self._atualizacoes_esperadas}")
-                self._ultima_atualizacao = time.time()
+                if self.calendario:
+                    tickers_rtd, espera = self._planejar_ciclo()
+                else:
+                    tickers_rtd, espera = self.tickers_rtd, self.interval_seconds
+                
+                if tickers_rtd:
+                    logger.info(f"Iniciando ciclo de atualização em {now}")
+                    self._solicitar_cotacoes(tickers_rtd)
+                    
+                    elapsed = time.time() - self._tempo_inicio
+                    logger.info(f"Ciclo de atualização concluído em {elapsed:.1f} segundos")
+                    logger.info(f"Atualizações recebidas: {self._atualizacoes_recebidas}/{len(tickers_rtd)}")
+                    if self.publicador:
+                        estatisticas = self.publicador.estatisticas()
+                        logger.info(f"Preços gravados: {estatisticas['gravados']} | Suprimidos (inalterados): {estatisticas['suprimidos']}")
+                    self._ultima_atualizacao = time.time()
+                else:
+                    logger.debug(f"Nenhuma classe de ativo em pregão em {now}")
                 
-                next_update = self.interval_seconds - elapsed
+                elapsed = time.time() - self._tempo_inicio
+                next_update = espera - elapsed
                 if next_update > 0:
                     next_time = time.strftime("%H:%M:%S", time.localtime(time.time() + next_update))
-                    logger.info(f"Próxima atualização às {next_time} ({next_update:.1f} segundos)")
+                    if tickers_rtd:
+                        logger.info(f"Próxima atualização às {next_time} ({next_update:.1f} segundos)")
                     self._signal.wait(next_update)
                     
-                else:
+                elif tickers_rtd:
                     logger.warning("Ciclo de atualização demorou mais que o intervalo configurado")
                     
         except Exception as e:
@@ -166,85 +230,128 @@ class RTDUpdater:
         finally:
             logger.info("Loop de atualização encerrado")
     
-    def _solicitar_cotacoes(self):
-        """Solicita cotações para todos os ativos usando a API RTD"""
-        logger.info("Iniciando solicitação de cotações via API RTD")
+    def _planejar_ciclo(self):
+        """
+        Seleciona os ativos a consultar no ciclo segundo o calendário da B3
+        
+        Returns:
+            tuple: (tickers_rtd, espera) com os tickers RTD a consultar agora e o tempo em
+                segundos até o próximo ciclo
+        """
+        agora = agora_b3()
+        monotonico = time.monotonic()
+        pregao_hoje = dia_de_pregao(agora.date())
+        
+        classes = {}
+        for ativo in self.ativos.values():
+            classes.setdefault(ativo.get('classe', 'etf'), []).append(ativo['ticker_rtd'])
+        
+        tickers_rtd = []
+        espera = self.intervalo_fora_pregao
+        for classe, tickers in classes.items():
+            if em_pregao(classe, agora):
+                consultar = True
+                espera = min(espera, self.interval_seconds)
+            else:
+                # Fora da sessão: consulta espaçada nos dias de pregão; nenhuma em fins de semana e feriados
+                consultar = pregao_hoje and \
+                    monotonico - self._consultado_em.get(classe, float('-inf')) >= self.intervalo_fora_pregao
+                espera = min(espera, (proxima_abertura(classe, agora) - agora).total_seconds())
+            
+            if consultar:
+                self._consultado_em[classe] = monotonico
+                tickers_rtd.extend(tickers)
+        
+        return tickers_rtd, max(espera, 1.0)
+    
+    def _solicitar_cotacoes(self, tickers_rtd=None):
+        """
+        Solicita cotações usando a API RTD (requisições concorrentes)
+        
+        Args:
+            tickers_rtd (list): Tickers RTD a consultar (padrão: todos os ativos)
+        """
+        tickers_rtd = self.tickers_rtd if tickers_rtd is None else tickers_rtd
+        logger.info(f"Iniciando solicitação de {len(tickers_rtd)} cotações via API RTD")
             
         try:
-            for ticker_rtd in self.tickers_rtd:
-                try:
-                    # Tipo de dado fixo como 'ULT' para o último preço
-                    data_type = "ULT"
-                    logger.info(f"Solicitando cotação para {ticker_rtd} ({data_type})")
-                    
-                    # Fazer requisição HTTP para a API RTD
-                    url = f"{self.api_url}/{ticker_rtd}/{data_type}"
-                    response = requests.get(url, timeout=self.timeout)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        price_str = data.get('value', '')
-                        
-                        # Converter o valor para float, substituindo a vírgula por ponto se necessário
-                        price_str = price_str.replace(',', '.')
-                        
-                        try:
-                            price = float(price_str)
-                            logger.info(f"Preço obtido para {ticker_rtd}: {price}")
-                            
-                            # Obter o ticker original do banco de dados
-                            original_ticker = self.ticker_map.get(ticker_rtd)
-                            if original_ticker:
-                                # Atualizar no banco de dados
-                                self._update_price(original_ticker, price)
-                                self._atualizacoes_recebidas += 1
-                            else:
-                                logger.warning(f"Ticker não encontrado no mapeamento: {ticker_rtd}")
-                        except ValueError:
-                            logger.warning(f"Valor não numérico recebido para {ticker_rtd}: {price_str}")
-                    else:
-                        logger.error(f"Erro ao obter cotação para {ticker_rtd}: {response.status_code}")
-                        
-                except requests.RequestException as e:
-                    logger.error(f"Erro na requisição para {ticker_rtd}: {str(e)}")
-                except Exception as e:
-                    logger.error(f"Erro ao processar cotação para {ticker_rtd}: {str(e)}")
+            # O ciclo inteiro deve caber no intervalo configurado
+            cotacoes, erros = self.cliente.obter_cotacoes(tickers_rtd, prazo=self.interval_seconds)
+            
+            for ticker_rtd, erro in erros.items():
+                logger.error(f"Erro ao obter cotação para {ticker_rtd}: {erro}")
+            
+            for ticker_rtd, price in cotacoes.items():
+                logger.debug(f"Preço obtido para {ticker_rtd}: {price}")
                 
-                # Pequeno delay entre requisições para não sobrecarregar a API
-                time.sleep(0.2)
+                # Obter o ticker original do banco de dados
+                original_ticker = self.ticker_map.get(ticker_rtd)
+                if original_ticker:
+                    # Ajustar a escala da cotação (ex.: mini dólar em pontos)
+                    price = price * self.fatores_escala.get(original_ticker, 1.0)
+                    
+                    # Acumular para a gravação em lote do ciclo
+                    self._update_price(original_ticker, price)
+                    if self.intraday:
+                        self.intraday.registrar(original_ticker, price)
+                    self._atualizacoes_recebidas += 1
+                else:
+                    logger.warning(f"Ticker não encontrado no mapeamento: {ticker_rtd}")
+            
+            self._publicar_precos()
+            self._gravar_intraday()
                 
         except Exception as e:
             logger.error(f"Erro ao solicitar cotações: {str(e)}")
     
     def _update_price(self, ticker: str, price: float):
-        """Atualiza o preço de um ativo no banco de dados"""
-        if not self.supabase:
+        """Registra o preço de um ativo para a gravação em lote do ciclo"""
+        if not self.publicador:
             logger.error("Supabase não inicializado. Não é possível atualizar preços.")
             return
 
+        ativo = self.ativos.get(ticker)
+        nome = ativo['nome'] if ativo else ticker
+        if not self.publicador.registrar(ticker, nome, price):
+            logger.debug(f"Preço inalterado para {ticker}: R$ {price:.2f}")
+
+    def _publicar_precos(self):
+        """Grava os preços acumulados no ciclo com um único upsert e atualiza o estado local"""
+        if not self.publicador or not self.publicador.pendentes():
+            logger.info("Nenhum preço alterado no ciclo; gravação omitida")
+            return 0
+
         try:
-            update_data = {
-                'preco_atual': price,
-                'data_atualizacao': datetime.now().isoformat()  # Atualizando a data da cotação
-            }
+            gravados = self.publicador.publicar()
+        except Exception as e:
+            logger.error(f"Erro ao gravar preços em lote: {str(e)}")
+            return 0
 
-            # Realiza a atualização no banco de dados
-            response = self.supabase.table('ativos').update(update_data).eq('ticker', ticker).execute()
+        # Atualiza os objetos locais também para manter a consistência
+        for registro in gravados:
+            ativo = self.ativos.get(registro['ticker'])
+            if ativo:
+                ativo['preco_atual'] = registro['preco_atual']
+                ativo['data_atualizacao'] = registro['data_atualizacao']
+            logger.info(f"Preço atualizado para {registro['ticker']}: R$ {registro['preco_atual']:.2f}")
 
-            # Verifica se a atualização foi realizada com sucesso
-            if response.data and len(response.data) > 0:
-                logger.info(f"Preço atualizado para {ticker}: R$ {price:.2f}")
+        logger.info(f"{len(gravados)} preços gravados em lote")
+        return len(gravados)
 
-                # Atualiza o objeto local também para manter a consistência
-                for ativo in self.ativos:
-                    if ativo['ticker'] == ticker:
-                        ativo['preco_atual'] = price
-                        ativo['data_atualizacao'] = update_data['data_atualizacao']
-                        break
-            else:
-                logger.warning(f"Nenhum registro atualizado para {ticker}")
+
+    def _gravar_intraday(self):
+        """Grava as cotações do ciclo no histórico intradiário com um único insert"""
+        if not self.intraday:
+            return 0
+
+        try:
+            gravados = self.intraday.gravar()
         except Exception as e:
-            logger.error(f"Erro ao atualizar preço para {ticker}: {str(e)}")
+            logger.error(f"Erro ao gravar cotações intradiárias: {str(e)}")
+            return 0
+
+        logger.info(f"{gravados} cotações gravadas no histórico intradiário")
+        return gravados
 
 
 def main():
@@ -255,6 +362,18 @@ def main():
                       help='Timeout para receber cotações em segundos (padrão: 20)')
     parser.add_argument('--single-run', action='store_true',
                       help='Executa apenas uma atualização e encerra')
+    parser.add_argument('--tolerancia', type=float, default=PRECO_TOLERANCIA,
+                      help='Variação relativa mínima para gravar um novo preço (padrão: 0, qualquer mudança)')
+    parser.add_argument('--heartbeat', type=float, default=PRECO_HEARTBEAT_SEGUNDOS,
+                      help=f'Intervalo em segundos para regravar preços inalterados (padrão: {PRECO_HEARTBEAT_SEGUNDOS:g})')
+    parser.add_argument('--calendario', action='store_true',
+                      help='Segue o calendário e os horários de pregão da B3 por classe de ativo')
+    parser.add_argument('--intervalo-fora-pregao', type=float, default=INTERVALO_FORA_PREGAO,
+                      help=f'Intervalo em segundos entre consultas fora da sessão no modo calendário (padrão: {INTERVALO_FORA_PREGAO:g})')
+    parser.add_argument('--shard', type=int, default=None,
+                      help='Índice do shard do universo de ativos a atualizar (padrão: todos)')
+    parser.add_argument('--total-shards', type=int, default=None,
+                      help='Número total de shards do universo de ativos')
     
     args = parser.parse_args()
     
@@ -268,14 +387,19 @@ def main():
         logger.info(f"Modo: Execução única")
     else:
         logger.info(f"Intervalo: {INTERVALO} segundos | Timeout: {TIMEOUT} segundos")
+        if args.calendario:
+            logger.info(f"Modo calendário B3: fora da sessão a cada {args.intervalo_fora_pregao:g} segundos, sem consultas em feriados")
     logger.info(f"API URL: {RTD_API_URL}")
     logger.info("=" * 60)
     
-    updater = RTDUpdater(interval_seconds=INTERVALO, timeout=TIMEOUT)
+    updater = RTDUpdater(interval_seconds=INTERVALO, timeout=TIMEOUT, shard=args.shard, total_shards=args.total_shards,
+                         tolerancia=args.tolerancia, heartbeat_seconds=args.heartbeat,
+                         calendario=args.calendario, intervalo_fora_pregao=args.intervalo_fora_pregao)
     
     if SINGLE_RUN:
         logger.info("Executando atualização única...")
         updater._solicitar_cotacoes()
+        updater.fechar()
         logger.info("Atualização única completada!")
     else:
         updater.start()
@@ -285,7 +409,7 @@ def main():
         except KeyboardInterrupt:
             logger.info("Interrupção detectada. Finalizando...")
         finally:
-            updater.stop()
+            updater.fechar()
 
     logger.info("Obrigado por usar o atualizador de preços via API RTD!")
 
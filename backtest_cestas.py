@@ -0,0 +1,228 @@
+import time
+import numpy as np
+from dados_mercado import preencher_adiante
+from motor_metricas import calcular_metricas
+
+# Frequências de rebalanceamento suportadas
+REBALANCEAMENTOS = ('nenhum', 'mensal', 'trimestral', 'limite')
+
+# Unidades aceitas para os pesos das cestas e tolerância na soma usada para identificá-las
+UNIDADES_PESOS = ('fracao', 'percentual')
+TOLERANCIA_SOMA_PESOS = 1e-6
+
+def normalizar_pesos(pesos, unidade=None):
+    """
+    Converte os pesos de uma cesta para frações do patrimônio
+
+    A parcela não alocada (1 - soma dos pesos) fica em caixa, remunerada pelo CDI; soma
+    acima de 1 em frações representa uma carteira alavancada.
+
+    Args:
+        pesos (numpy.ndarray): Pesos informados na cesta
+        unidade (str): 'fracao' ou 'percentual'. Se não informada, os pesos são aceitos
+            apenas quando a unidade é inequívoca: soma até 1 (frações) ou igual a 100 (percentuais)
+
+    Returns:
+        numpy.ndarray: Pesos como fração do patrimônio
+
+    Raises:
+        ValueError: Se a unidade for inválida ou não puder ser determinada
+    """
+    pesos = np.asarray(pesos, dtype=float)
+    if unidade is None:
+        soma = pesos.sum()
+        if soma <= 1 + TOLERANCIA_SOMA_PESOS:
+            unidade = 'fracao'
+        elif abs(soma - 100) <= 100 * TOLERANCIA_SOMA_PESOS:
+            unidade = 'percentual'
+        else:
+            raise ValueError(
+                f"Pesos somando {soma:g}: informe 'unidade' ('fracao' ou 'percentual')"
+            )
+
+    if unidade not in UNIDADES_PESOS:
+        raise ValueError(f"Unidade de pesos inválida: {unidade}. Use 'fracao' ou 'percentual'")
+    return pesos / 100 if unidade == 'percentual' else pesos
+
+def preparar_precos(datas, matriz, serie_caixa=None):
+    """
+    Alinha a matriz de preços para a simulação, acrescentando o caixa como última coluna
+
+    Args:
+        datas (numpy.ndarray): Datas (datetime64) da matriz
+        matriz (numpy.ndarray): Preços (datas x ativos), com NaN onde o ativo não tem registro
+        serie_caixa (numpy.ndarray): Índice do CDI alinhado às datas (None = caixa sem remuneração)
+
+    Returns:
+        tuple: (datas, precos) a partir da primeira data em que todos os ativos têm preço
+    """
+    if serie_caixa is None:
+        serie_caixa = np.ones(len(datas))
+
+    precos = preencher_adiante(np.column_stack([matriz, serie_caixa]))
+
+    # O caixa sem cotação no início da janela é tratado como não remunerado
+    caixa = precos[:, -1]
+    if np.isnan(caixa).all():
+        precos[:, -1] = 1.0
+    else:
+        primeiro = np.flatnonzero(~np.isnan(caixa))[0]
+        precos[:primeiro, -1] = caixa[primeiro]
+
+    completas = ~np.isnan(precos).any(axis=1)
+    if not completas.any():
+        raise ValueError("Não há período comum com preços para todos os ativos da cesta")
+
+    inicio = np.argmax(completas)
+    return np.asarray(datas)[inicio:], precos[inicio:]
+
+def indices_rebalanceamento(datas, frequencia):
+    """
+    Retorna os índices das datas de rebalanceamento periódico (primeiro pregão do mês/trimestre)
+
+    Args:
+        datas (numpy.ndarray): Datas (datetime64) em ordem crescente
+        frequencia (str): 'nenhum', 'mensal' ou 'trimestral'
+
+    Returns:
+        numpy.ndarray: Índices das datas de rebalanceamento, sempre começando em 0
+    """
+    if frequencia == 'nenhum':
+        return np.array([0])
+
+    meses = np.asarray(datas).astype('datetime64[M]').astype(int)
+    if frequencia == 'trimestral':
+        meses = meses // 3
+
+    return np.concatenate([[0], np.flatnonzero(meses[1:] != meses[:-1]) + 1])
+
+def _indices_por_limite(precos, pesos, limite_desvio):
+    """Encontra as datas em que algum peso se afasta do alvo mais que limite_desvio"""
+    indices = [0]
+    inicio = 0
+
+    while True:
+        # Pesos à deriva em todas as datas seguintes, calculados de uma só vez
+        relativos = precos[inicio + 1:] / precos[inicio]
+        valores = relativos * pesos
+        totais = valores.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            desvios = np.abs(valores / totais - pesos).max(axis=1)
+
+        rompimentos = np.flatnonzero(desvios > limite_desvio)
+        if len(rompimentos) == 0:
+            return np.array(indices)
+
+        inicio = inicio + 1 + rompimentos[0]
+        indices.append(inicio)
+
+def simular(datas, precos, pesos, rebalanceamento='mensal', limite_desvio=0.05,
+            custo_transacao_bps=0.0, capital_inicial=100.0, incluir_curva=True):
+    """
+    Simula uma cesta de ativos com rebalanceamento, de forma vetorizada sobre a matriz data x ativo
+
+    Entre dois rebalanceamentos as quantidades ficam constantes, de modo que o patrimônio
+    em cada data é o produto da matriz de preços relativos pelos pesos do segmento. O
+    crescimento e o giro de cada segmento independem do patrimônio, o que permite
+    calcular todos os segmentos de uma vez com um produto acumulado.
+
+    Args:
+        datas (numpy.ndarray): Datas (datetime64) retornadas por preparar_precos
+        precos (numpy.ndarray): Preços (datas x ativos) com o caixa na última coluna
+        pesos (numpy.ndarray): Pesos alvo dos ativos (sem o caixa), como fração do patrimônio
+        rebalanceamento (str): 'nenhum', 'mensal', 'trimestral' ou 'limite'
+        limite_desvio (float): Desvio absoluto de peso que dispara o rebalanceamento no modo 'limite'
+        custo_transacao_bps (float): Custo de transação em pontos-base sobre o volume negociado
+        capital_inicial (float): Patrimônio inicial
+        incluir_curva (bool): Se True, retorna a curva de patrimônio diária
+
+    Returns:
+        dict: Curva de patrimônio (opcional), indicadores e estatísticas da simulação
+    """
+    if rebalanceamento not in REBALANCEAMENTOS:
+        raise ValueError(f"Rebalanceamento inválido: {rebalanceamento}. Use {', '.join(REBALANCEAMENTOS)}")
+
+    # O caixa recebe a parcela não alocada (negativa se a cesta estiver alavancada)
+    pesos = np.asarray(pesos, dtype=float)
+    pesos = np.append(pesos, 1.0 - pesos.sum())
+    custo = custo_transacao_bps / 10000
+
+    if rebalanceamento == 'limite':
+        inicios = _indices_por_limite(precos, pesos, limite_desvio)
+    else:
+        inicios = indices_rebalanceamento(datas, rebalanceamento)
+
+    # Crescimento e giro de cada segmento entre rebalanceamentos
+    fins = np.append(inicios[1:], len(precos) - 1)
+    relativos_segmento = precos[fins] / precos[inicios]
+    crescimento = relativos_segmento @ pesos
+    pesos_deriva = relativos_segmento * pesos / crescimento[:, None]
+    giro = np.abs(pesos_deriva[:-1] - pesos).sum(axis=1)
+
+    # Custo da montagem inicial e de cada rebalanceamento
+    giro_inicial = np.abs(pesos).sum()
+    fator_custo = np.concatenate([[1 - custo * giro_inicial], 1 - custo * giro])
+    patrimonio_inicio_segmento = capital_inicial * np.cumprod(
+        fator_custo * np.concatenate([[1.0], crescimento[:-1]])
+    )
+
+    # Patrimônio diário: cada data usa os pesos e o patrimônio do seu segmento
+    segmento = np.searchsorted(inicios, np.arange(len(precos)), side='right') - 1
+    patrimonio = patrimonio_inicio_segmento[segmento] * ((precos / precos[inicios[segmento]]) @ pesos)
+
+    serie_caixa = precos[:, -1]
+    taxa_livre_risco = None
+    if serie_caixa[-1] != serie_caixa[0]:
+        taxa_livre_risco = calcular_metricas(datas, serie_caixa)['retorno_anualizado']
+
+    resultado = {
+        'metricas': calcular_metricas(datas, patrimonio, taxa_livre_risco),
+        'patrimonio_final': round(float(patrimonio[-1]), 4),
+        'rebalanceamentos': int(len(inicios) - 1),
+        'giro_medio': round(float(giro.mean()), 6) if len(giro) else 0.0,
+        'custos_totais_pct': round(float((1 - np.prod(fator_custo)) * 100), 4)
+    }
+
+    if incluir_curva:
+        resultado['curva'] = {'datas': datas, 'patrimonio': patrimonio}
+
+    return resultado
+
+def varrer_variantes(datas, precos, variantes):
+    """
+    Executa várias simulações da mesma cesta (pesos e regras de rebalanceamento diferentes)
+
+    Args:
+        datas (numpy.ndarray): Datas retornadas por preparar_precos
+        precos (numpy.ndarray): Preços retornados por preparar_precos
+        variantes (list): Lista de dicionários com 'pesos' e, opcionalmente, 'rebalanceamento',
+            'limite_desvio' e 'custo_transacao_bps'
+
+    Returns:
+        dict: Resultados de cada variante (sem a curva diária) e o tempo total
+    """
+    inicio = time.perf_counter()
+    resultados = []
+
+    for numero, variante in enumerate(variantes):
+        try:
+            resultado = simular(
+                datas,
+                precos,
+                variante['pesos'],
+                rebalanceamento=variante.get('rebalanceamento', 'mensal'),
+                limite_desvio=variante.get('limite_desvio', 0.05),
+                custo_transacao_bps=variante.get('custo_transacao_bps', 0.0),
+                incluir_curva=False
+            )
+        except (KeyError, ValueError) as e:
+            resultado = {'erro': str(e)}
+
+        resultado['variante'] = numero
+        resultados.append(resultado)
+
+    return {
+        'resultados': resultados,
+        'total_variantes': len(resultados),
+        'tempo_ms': round((time.perf_counter() - inicio) * 1000, 3)
+    }
@@ -0,0 +1,139 @@
+import os
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# Fuso horário dos pregões da B3
+FUSO_B3 = ZoneInfo('America/Sao_Paulo')
+
+# Sessões de negociação por classe de ativo (horário de Brasília); classes ausentes usam 'etf'
+SESSOES_PADRAO = {
+    'etf': ('10:00', '18:00'),
+    'acao': ('10:00', '18:00'),
+    # Mini dólar (WDOFUT) no mercado de derivativos
+    'cambio': ('09:00', '18:30')
+}
+
+# Substituições no formato "classe=HH:MM-HH:MM,classe=HH:MM-HH:MM"
+B3_SESSOES = os.environ.get('B3_SESSOES', '')
+# Datas adicionais sem pregão no formato "YYYY-MM-DD,YYYY-MM-DD" (ex.: feriados decretados no ano)
+B3_FERIADOS_EXTRAS = os.environ.get('B3_FERIADOS_EXTRAS', '')
+
+# Feriados fixos sem pregão (mês, dia)
+FERIADOS_FIXOS = (
+    (1, 1),    # Confraternização Universal
+    (4, 21),   # Tiradentes
+    (5, 1),    # Dia do Trabalho
+    (9, 7),    # Independência
+    (10, 12),  # Nossa Senhora Aparecida
+    (11, 2),   # Finados
+    (11, 15),  # Proclamação da República
+    (12, 24),  # Véspera de Natal
+    (12, 25),  # Natal
+    (12, 31)   # Último dia do ano
+)
+
+
+def _interpretar_sessoes(texto):
+    sessoes = dict(SESSOES_PADRAO)
+    for item in filter(None, (parte.strip() for parte in texto.split(','))):
+        classe, horario = item.split('=')
+        inicio, fim = horario.split('-')
+        sessoes[classe.strip()] = (inicio.strip(), fim.strip())
+    return {
+        classe: (time.fromisoformat(inicio), time.fromisoformat(fim))
+        for classe, (inicio, fim) in sessoes.items()
+    }
+
+SESSOES = _interpretar_sessoes(B3_SESSOES)
+
+FERIADOS_EXTRAS = frozenset(
+    date.fromisoformat(data.strip()) for data in B3_FERIADOS_EXTRAS.split(',') if data.strip()
+)
+
+
+def _pascoa(ano):
+    """Data do domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)"""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+@lru_cache(maxsize=None)
+def feriados_b3(ano):
+    """
+    Retorna os dias sem pregão na B3 em um ano (além dos fins de semana)
+
+    Args:
+        ano (int): O ano
+
+    Returns:
+        frozenset: Conjunto de datas
+    """
+    pascoa = _pascoa(ano)
+    feriados = {date(ano, mes, dia) for mes, dia in FERIADOS_FIXOS}
+    feriados |= {
+        pascoa - timedelta(days=48),  # Segunda-feira de Carnaval
+        pascoa - timedelta(days=47),  # Terça-feira de Carnaval
+        pascoa - timedelta(days=2),   # Sexta-feira Santa
+        pascoa + timedelta(days=60)   # Corpus Christi
+    }
+    if ano >= 2024:
+        feriados.add(date(ano, 11, 20))  # Dia Nacional de Zumbi e da Consciência Negra
+    return frozenset(feriados | {data for data in FERIADOS_EXTRAS if data.year == ano})
+
+def dia_de_pregao(dia):
+    """Verifica se há pregão na data (dia útil que não é feriado da B3)"""
+    return dia.weekday() < 5 and dia not in feriados_b3(dia.year)
+
+def agora_b3():
+    """Instante atual no fuso horário da B3"""
+    return datetime.now(FUSO_B3)
+
+def sessao(classe):
+    """Retorna o horário (início, fim) da sessão de negociação da classe de ativo"""
+    return SESSOES.get(classe, SESSOES['etf'])
+
+def em_pregao(classe, instante=None):
+    """
+    Verifica se a classe de ativo está em sessão de negociação
+
+    Args:
+        classe (str): Classe do ativo ('etf', 'acao', 'cambio', ...)
+        instante (datetime): Instante com fuso horário (padrão: agora)
+
+    Returns:
+        bool: True se o instante está dentro da sessão de um dia de pregão
+    """
+    instante = (instante or agora_b3()).astimezone(FUSO_B3)
+    if not dia_de_pregao(instante.date()):
+        return False
+    inicio, fim = sessao(classe)
+    return inicio <= instante.time() < fim
+
+def proxima_abertura(classe, instante=None):
+    """
+    Retorna o início da próxima sessão da classe de ativo (a atual não conta se já começou)
+
+    Args:
+        classe (str): Classe do ativo
+        instante (datetime): Instante com fuso horário (padrão: agora)
+
+    Returns:
+        datetime: Início da próxima sessão, no fuso horário da B3
+    """
+    instante = (instante or agora_b3()).astimezone(FUSO_B3)
+    inicio, _ = sessao(classe)
+    dia = instante.date()
+    if instante.time() >= inicio:
+        dia += timedelta(days=1)
+    while not dia_de_pregao(dia):
+        dia += timedelta(days=1)
+    return datetime.combine(dia, inicio, tzinfo=FUSO_B3)
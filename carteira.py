@@ -0,0 +1,504 @@
+import os
+import threading
+import time
+import numpy as np
+from dados_mercado import TAMANHO_PAGINA, cache_historico, montar_matriz, preencher_adiante
+from motor_metricas import calcular_metricas, DIAS_ANO_CIVIL
+
+# Intervalo (em segundos) entre as releituras completas das transações, feitas em segundo plano
+# para incorporar gravações de outros processos (0 = apenas por invalidação explícita)
+CARTEIRA_INTERVALO_RELEITURA = int(os.environ.get('CARTEIRA_INTERVALO_RELEITURA', 300))
+
+
+def _posicao_vazia(asset, ativo_id=None):
+    return {
+        'asset': asset,
+        'ativo_id': ativo_id,
+        'quantidade': 0,
+        'preco_medio': 0,
+        'total_investido': 0,
+        # Compras menos vendas, sem o ajuste a zero de 'quantidade' (usado nas validações)
+        'saldo': 0
+    }
+
+def aplicar_transacao(posicao, tipo, quantidade, preco):
+    """
+    Aplica uma transação à posição de um ativo (preço médio ponderado pelas compras)
+
+    Args:
+        posicao (dict): Posição do ativo, alterada no próprio dicionário
+        tipo (str): 'buy' ou 'sell'
+        quantidade (float): Quantidade negociada
+        preco (float): Preço unitário
+    """
+    posicao['saldo'] += quantidade if tipo == 'buy' else -quantidade
+
+    if tipo == 'buy':
+        quantidade_antiga = posicao['quantidade']
+        valor_antigo = quantidade_antiga * posicao['preco_medio']
+        valor_novo = quantidade * preco
+        quantidade_total = quantidade_antiga + quantidade
+
+        if quantidade_total > 0:
+            posicao['preco_medio'] = (valor_antigo + valor_novo) / quantidade_total
+
+        posicao['quantidade'] += quantidade
+        posicao['total_investido'] += valor_novo
+    else:  # sell
+        posicao['quantidade'] -= quantidade
+
+        # Ajustar o valor investido proporcionalmente
+        if posicao['quantidade'] > 0:
+            posicao['total_investido'] = posicao['quantidade'] * posicao['preco_medio']
+        else:
+            posicao['quantidade'] = 0
+            posicao['total_investido'] = 0
+
+
+class PosicoesCarteira:
+    def __init__(self, supabase, intervalo_releitura=CARTEIRA_INTERVALO_RELEITURA):
+        """
+        Posições da carteira (quantidade, preço médio e total investido por ativo), montadas
+        uma vez a partir da tabela 'transacoes' e mantidas incrementalmente a cada inclusão
+        ou exclusão de transação
+
+        As releituras completas (periódicas ou pedidas por invalidar) são feitas por uma
+        thread em segundo plano, fora do caminho das requisições; as transações registradas
+        ou removidas durante uma releitura são reaplicadas sobre o resultado.
+
+        Args:
+            supabase: Cliente Supabase inicializado
+            intervalo_releitura (int): Segundos entre as releituras completas em segundo plano
+        """
+        self.supabase = supabase
+        self.intervalo_releitura = intervalo_releitura
+        self._lock = threading.RLock()
+        self._carregado_em = 0
+
+        # Alterações feitas durante uma releitura em andamento (None = nenhuma releitura)
+        self._alteracoes = None
+        self._thread = None
+        self._releitura_pedida = threading.Event()
+
+        # ticker -> posição
+        self._posicoes = {}
+        # ticker -> transações do ativo na ordem de inclusão: (id, tipo, quantidade, preço, data)
+        self._transacoes = {}
+        # id da transação -> ticker
+        self._chaves = {}
+        # id do ativo -> ticker
+        self._tickers_por_id = {}
+        # ticker -> lock que serializa as gravações do ativo
+        self._locks_ativos = {}
+
+        # Incrementada a cada mudança nas transações; invalida o desempenho calculado
+        self.versao = 0
+        self._desempenho = None
+
+    def _ler_transacoes(self):
+        """Lê todas as transações em ordem de inclusão, com paginação por id"""
+        registros = []
+        ultimo_id = None
+        while True:
+            consulta = self.supabase.table('transacoes').select('*')
+            if ultimo_id is not None:
+                consulta = consulta.gt('id', ultimo_id)
+            pagina = consulta.order('id', desc=False).limit(TAMANHO_PAGINA).execute().data or []
+            registros.extend(pagina)
+            if len(pagina) < TAMANHO_PAGINA:
+                return registros
+            ultimo_id = pagina[-1]['id']
+
+    def _chave(self, transacao):
+        """Ticker do ativo referenciado por 'ativo_id' (ou da coluna 'asset' das transações antigas)"""
+        return self._tickers_por_id.get(transacao.get('ativo_id')) or transacao.get('asset')
+
+    def _ler_ativos(self):
+        return self.supabase.table('ativos').select('id,ticker').execute().data or []
+
+    def _reconstruir(self, ativos, transacoes):
+        """Substitui todas as posições pelas montadas a partir da leitura completa (com o lock adquirido)"""
+        self._tickers_por_id = {ativo['id']: ativo['ticker'] for ativo in ativos}
+
+        self._posicoes = {}
+        self._transacoes = {}
+        self._chaves = {}
+        for transacao in transacoes:
+            self._incluir(transacao)
+
+        self._carregado_em = time.time()
+        self.versao += 1
+
+    def _carregar(self):
+        """
+        Monta as posições na primeira consulta (chamado com o lock adquirido); depois disso
+        elas só mudam pelas transações registradas e pelas releituras em segundo plano
+        """
+        if self._carregado_em:
+            return
+        self._reconstruir(self._ler_ativos(), self._ler_transacoes())
+        self._iniciar_releitura()
+
+    def _iniciar_releitura(self):
+        """Inicia a thread de releitura em segundo plano, se ainda não estiver em execução"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop_releitura, name='releitura-carteira', daemon=True)
+            self._thread.start()
+
+    def _loop_releitura(self):
+        while True:
+            self._releitura_pedida.wait(self.intervalo_releitura or None)
+            self._releitura_pedida.clear()
+            try:
+                self.recarregar()
+            except Exception as e:
+                print(f"⚠️ Erro ao reler as transações da carteira: {str(e)}")
+
+    def recarregar(self):
+        """
+        Relê todas as transações sem bloquear as consultas e substitui as posições, reaplicando
+        as transações registradas ou removidas por este processo durante a leitura
+        """
+        with self._lock:
+            if self._alteracoes is not None:
+                # Já há uma releitura em andamento
+                return
+            self._alteracoes = []
+
+        try:
+            ativos = self._ler_ativos()
+            transacoes = self._ler_transacoes()
+        except Exception:
+            with self._lock:
+                self._alteracoes = None
+            raise
+
+        with self._lock:
+            alteracoes, self._alteracoes = self._alteracoes, None
+            self._reconstruir(ativos, transacoes)
+            for operacao, *argumentos in alteracoes:
+                if operacao == 'registrar':
+                    self._aplicar_registro(*argumentos)
+                else:
+                    self._aplicar_remocao(*argumentos)
+
+    def _incluir(self, transacao):
+        chave = self._chave(transacao)
+        if chave is None:
+            return None
+
+        item = (
+            transacao['id'], transacao['type'], float(transacao['quantity']),
+            float(transacao['price']), str(transacao.get('date') or '')[:10]
+        )
+        posicao = self._posicoes.setdefault(chave, _posicao_vazia(chave, transacao.get('ativo_id')))
+        if posicao['ativo_id'] is None:
+            posicao['ativo_id'] = transacao.get('ativo_id')
+
+        self._transacoes.setdefault(chave, []).append(item)
+        self._chaves[transacao['id']] = chave
+        aplicar_transacao(posicao, item[1], item[2], item[3])
+        return chave
+
+    def _recalcular(self, chave):
+        """Refaz a posição de um único ativo a partir das suas transações em memória"""
+        anterior = self._posicoes.get(chave) or _posicao_vazia(chave)
+        posicao = _posicao_vazia(chave, anterior['ativo_id'])
+        for _, tipo, quantidade, preco, _ in self._transacoes.get(chave, []):
+            aplicar_transacao(posicao, tipo, quantidade, preco)
+        self._posicoes[chave] = posicao
+
+    def posicoes(self):
+        """
+        Retorna as posições atuais de todos os ativos já negociados
+
+        Returns:
+            list: Cópias das posições (asset, ativo_id, quantidade, preco_medio, total_investido)
+        """
+        with self._lock:
+            self._carregar()
+            return [dict(posicao) for posicao in self._posicoes.values()]
+
+    def ticker(self, transacao):
+        """Ticker a que uma transação se refere (por 'ativo_id' ou pela coluna 'asset')"""
+        with self._lock:
+            self._carregar()
+            return self._chave(transacao)
+
+    def saldo(self, ticker):
+        """
+        Quantidade do ativo em carteira (compras menos vendas), mantida a cada transação
+        registrada ou removida; consultada com o lock do ativo adquirido, antes da gravação
+        """
+        with self._lock:
+            self._carregar()
+            posicao = self._posicoes.get(ticker)
+            return posicao['saldo'] if posicao else 0
+
+    def lock_ativo(self, ticker):
+        """
+        Lock do ativo: mantido da validação até a gravação de uma transação, impede que
+        gravações concorrentes vendam mais do que o saldo
+        """
+        with self._lock:
+            return self._locks_ativos.setdefault(ticker, threading.Lock())
+
+    def registrar(self, transacao, ticker=None):
+        """
+        Incorpora uma transação recém-gravada às posições
+
+        Args:
+            transacao (dict): Registro inserido na tabela 'transacoes'
+            ticker (str): Ticker do ativo, se a transação referenciar um ativo ainda não conhecido
+        """
+        with self._lock:
+            if self._alteracoes is not None:
+                self._alteracoes.append(('registrar', transacao, ticker))
+            if not self._carregado_em:
+                # As posições ainda não foram montadas: a carga completa já incluirá a transação
+                return
+            self._aplicar_registro(transacao, ticker)
+
+    def _aplicar_registro(self, transacao, ticker=None):
+        if ticker and transacao.get('ativo_id') is not None:
+            self._tickers_por_id[transacao['ativo_id']] = ticker
+        if transacao['id'] not in self._chaves and self._incluir(transacao) is not None:
+            self.versao += 1
+
+    def remover(self, id_transacao):
+        """Retira uma transação excluída e refaz a posição do seu ativo"""
+        with self._lock:
+            if self._alteracoes is not None:
+                self._alteracoes.append(('remover', id_transacao))
+            self._aplicar_remocao(id_transacao)
+
+    def _aplicar_remocao(self, id_transacao):
+        chave = self._chaves.pop(id_transacao, None)
+        if chave is None:
+            return
+        self._transacoes[chave] = [item for item in self._transacoes[chave] if item[0] != id_transacao]
+        self._recalcular(chave)
+        self.versao += 1
+
+    def desempenho(self, obter_serie):
+        """
+        Retorna a curva de patrimônio e os retornos da carteira, recalculados apenas quando
+        uma transação muda ou a série de algum ativo é recarregada (novo pregão)
+
+        Args:
+            obter_serie (callable): Função ticker -> DataFrame com a série histórica completa
+
+        Returns:
+            dict: Resultado de calcular_desempenho ou None se não houver transações
+        """
+        with self._lock:
+            self._carregar()
+            versao = self.versao
+            transacoes = [
+                (chave, tipo, quantidade, preco, data)
+                for chave, itens in self._transacoes.items()
+                for _, tipo, quantidade, preco, data in itens
+            ]
+            anterior = self._desempenho
+
+        if not transacoes:
+            return None
+
+        tickers = list(dict.fromkeys(transacao[0] for transacao in transacoes))
+        series = {ticker: obter_serie(ticker) for ticker in tickers}
+        # obter_serie devolve um novo recorte a cada chamada: a identidade comparada é a da
+        # série completa em cache, substituída apenas quando o ticker é recarregado
+        origens = tuple(_origem_serie(ticker, series[ticker]) for ticker in tickers)
+
+        if anterior is not None and anterior[0] == versao and len(anterior[1]) == len(origens) and \
+                all(a is b for a, b in zip(anterior[1], origens)):
+            return anterior[2]
+
+        resultado = calcular_desempenho(transacoes, series)
+
+        with self._lock:
+            if self.versao == versao:
+                self._desempenho = (versao, origens, resultado)
+
+        return resultado
+
+    def invalidar(self):
+        """Pede uma releitura completa das transações em segundo plano (as consultas seguem com as posições atuais)"""
+        with self._lock:
+            if not self._carregado_em:
+                return
+            self._iniciar_releitura()
+        self._releitura_pedida.set()
+
+
+def _origem_serie(ticker, dados):
+    """Série completa do ticker em cache (ou o próprio recorte, se a série não foi armazenada)"""
+    origem = cache_historico.obter(ticker, contabilizar=False)
+    return dados if origem is None else origem
+
+def _taxa_interna_retorno(dias, fluxos):
+    """
+    Taxa interna de retorno diária de fluxos datados (bisseção sobre o valor presente)
+
+    Args:
+        dias (numpy.ndarray): Dias corridos de cada fluxo desde o primeiro
+        fluxos (numpy.ndarray): Fluxos do ponto de vista do investidor (aportes negativos)
+
+    Returns:
+        float: Taxa por dia corrido ou None se não houver troca de sinal
+    """
+    def valor_presente(taxa):
+        return np.sum(fluxos * np.exp(-dias * np.log1p(taxa)))
+
+    inferior, superior = -0.5, 1.0
+    vp_inferior = valor_presente(inferior)
+    if not np.isfinite(vp_inferior) or np.sign(vp_inferior) == np.sign(valor_presente(superior)):
+        return None
+
+    for _ in range(200):
+        meio = (inferior + superior) / 2
+        vp_meio = valor_presente(meio)
+        if np.sign(vp_meio) == np.sign(vp_inferior):
+            inferior, vp_inferior = meio, vp_meio
+        else:
+            superior = meio
+        if superior - inferior < 1e-14:
+            break
+
+    return (inferior + superior) / 2
+
+def calcular_desempenho(transacoes, series, coluna='fechamento'):
+    """
+    Calcula a curva de patrimônio diária da carteira em uma passada vetorizada data x ativo
+
+    Compras são tratadas como aportes e vendas como resgates (a carteira não tem caixa).
+    O retorno ponderado pelo tempo encadeia os retornos diários sobre o patrimônio do dia
+    anterior, com os fluxos no fim do dia (o resultado de uma compra entre o preço pago e
+    o fechamento entra no retorno do próprio dia); quando não há patrimônio na véspera, as
+    compras do dia são o capital. O ponderado pelo capital é a taxa interna de retorno dos
+    aportes, resgates e do patrimônio final.
+
+    Args:
+        transacoes (list): Tuplas (ticker, tipo, quantidade, preço, data 'YYYY-MM-DD')
+        series (dict): Dicionário ticker -> DataFrame com a série histórica do ativo
+        coluna (str): Coluna de preços usada na avaliação (padrão: 'fechamento')
+
+    Returns:
+        dict: curva (data, patrimonio, aportes, retorno_acumulado, drawdown), retornos
+            (twr, twr_anualizado, mwr, mwr_anualizado, volatilidade, max_drawdown, em %) e
+            contribuição de cada ativo ao retorno acumulado
+    """
+    tickers = list(dict.fromkeys(transacao[0] for transacao in transacoes))
+    indice_ticker = {ticker: j for j, ticker in enumerate(tickers)}
+
+    ativo = np.array([indice_ticker[transacao[0]] for transacao in transacoes])
+    sinal = np.array([1.0 if transacao[1] == 'buy' else -1.0 for transacao in transacoes])
+    quantidade = np.array([transacao[2] for transacao in transacoes]) * sinal
+    preco = np.array([transacao[3] for transacao in transacoes])
+    datas_transacoes = np.array([transacao[4] for transacao in transacoes], dtype='datetime64[D]')
+
+    # Eixo de datas: pregões a partir da primeira transação mais as próprias datas das transações
+    disponiveis = {ticker: dados for ticker, dados in series.items() if dados is not None and not dados.empty}
+    datas_mercado, colunas_mercado, matriz = montar_matriz(disponiveis, coluna)
+    datas_mercado = datas_mercado.astype('datetime64[D]')
+    no_periodo = datas_mercado >= datas_transacoes.min()
+    datas = np.unique(np.concatenate([datas_mercado[no_periodo], datas_transacoes]))
+    linhas_transacoes = np.searchsorted(datas, datas_transacoes)
+
+    # Preços de mercado; na falta deles, o preço das transações do dia; depois, o último conhecido
+    precos = np.full((len(datas), len(tickers)), np.nan)
+    if colunas_mercado:
+        colunas = [indice_ticker[ticker] for ticker in colunas_mercado]
+        precos[np.ix_(np.searchsorted(datas, datas_mercado[no_periodo]), colunas)] = matriz[no_periodo]
+    precos_transacoes = np.full_like(precos, np.nan)
+    precos_transacoes[linhas_transacoes, ativo] = preco
+    precos = np.where(np.isnan(precos), precos_transacoes, precos)
+    precos = np.nan_to_num(preencher_adiante(precos))
+
+    # Quantidades e fluxos por data e ativo
+    variacoes = np.zeros_like(precos)
+    np.add.at(variacoes, (linhas_transacoes, ativo), quantidade)
+    quantidades = np.cumsum(variacoes, axis=0)
+
+    fluxos_ativos = np.zeros_like(precos)
+    np.add.at(fluxos_ativos, (linhas_transacoes, ativo), quantidade * preco)
+    fluxos = fluxos_ativos.sum(axis=1)
+
+    valores = quantidades * precos
+    patrimonio = valores.sum(axis=1)
+    valores_anteriores = np.vstack([np.zeros(len(tickers)), valores[:-1]])
+
+    # Resultado diário de cada ativo e capital em risco do dia: os fluxos ocorrem no fim do
+    # dia (o capital é o patrimônio da véspera); sem patrimônio na véspera (primeira compra
+    # ou recompra após zerar a carteira), as compras do dia formam o capital inicial
+    resultados = valores - valores_anteriores - fluxos_ativos
+    patrimonio_anterior = valores_anteriores.sum(axis=1)
+    capital = np.where(patrimonio_anterior > 0, patrimonio_anterior, np.maximum(fluxos, 0))
+    com_capital = capital > 0
+    contribuicoes_diarias = np.divide(resultados, capital[:, None], out=np.zeros_like(resultados),
+                                      where=com_capital[:, None])
+    retornos = contribuicoes_diarias.sum(axis=1)
+
+    # Índice encadeado (base 1) e drawdown
+    indice = np.cumprod(1 + retornos)
+    drawdown = indice / np.maximum(np.maximum.accumulate(indice), 1.0) - 1
+
+    # Contribuição de cada ativo ao retorno acumulado: a contribuição diária é ponderada
+    # pelo crescimento acumulado até a véspera, de modo que a soma é exatamente o retorno
+    crescimento_anterior = np.concatenate([[1.0], indice[:-1]])
+    contribuicoes = (contribuicoes_diarias * crescimento_anterior[:, None]).sum(axis=0)
+
+    # Taxa interna de retorno (por dia corrido): aportes negativos, resgates positivos e o patrimônio final
+    dias = (datas - datas[0]).astype(float)
+    fluxos_investidor = -fluxos.copy()
+    fluxos_investidor[-1] += patrimonio[-1]
+    taxa_diaria = _taxa_interna_retorno(dias, fluxos_investidor)
+
+    # O retorno do período é composto apenas enquanto houve capital investido: da primeira
+    # transação até o último dia com posição aberta ou fluxo (dias após zerar a carteira não contam)
+    investido = np.flatnonzero((np.abs(patrimonio) > 0) | (fluxos != 0))
+    dias_investidos = dias[investido[-1]] if len(investido) else 0.0
+
+    mwr = mwr_anualizado = None
+    if taxa_diaria is not None:
+        with np.errstate(over='ignore'):
+            mwr = float(np.expm1(dias_investidos * np.log1p(taxa_diaria))) * 100
+            mwr_anualizado = float(np.expm1(DIAS_ANO_CIVIL * np.log1p(taxa_diaria))) * 100
+
+    # Base 1 na véspera da primeira transação: o retorno do primeiro dia (preço pago até o
+    # fechamento) entra nas métricas, que partem do primeiro ponto da série
+    metricas = calcular_metricas(
+        np.concatenate([[datas[0] - np.timedelta64(1, 'D')], datas]),
+        np.concatenate([[1.0], indice])
+    ) or {}
+    datas_str = np.datetime_as_string(datas, unit='D')
+
+    return {
+        'curva': [
+            {
+                'data': datas_str[i],
+                'patrimonio': round(float(patrimonio[i]), 2),
+                'aportes': round(float(fluxos[i]), 2),
+                'retorno_acumulado': round(float(indice[i] - 1) * 100, 4),
+                'drawdown': round(float(drawdown[i]) * 100, 4)
+            }
+            for i in range(len(datas))
+        ],
+        'retornos': {
+            'twr': metricas.get('retorno_acumulado'),
+            'twr_anualizado': metricas.get('retorno_anualizado'),
+            'mwr': round(mwr, 2) if mwr is not None else None,
+            'mwr_anualizado': round(mwr_anualizado, 2) if mwr_anualizado is not None and np.isfinite(mwr_anualizado) else None,
+            'volatilidade': metricas.get('volatilidade'),
+            'max_drawdown': metricas.get('max_drawdown')
+        },
+        'contribuicao': [
+            {
+                'asset': ticker,
+                'contribuicao': round(float(contribuicoes[j]) * 100, 4),
+                'lucro': round(float(resultados[:, j].sum()), 2),
+                'valor_atual': round(float(valores[-1, j]), 2)
+            }
+            for j, ticker in enumerate(tickers)
+        ]
+    }
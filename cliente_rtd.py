@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+
+# Limites de uso da API RTD
+RTD_MAX_CONCORRENCIA = int(os.environ.get('RTD_MAX_CONCORRENCIA', 8))
+RTD_MAX_REQUISICOES_SEGUNDO = float(os.environ.get('RTD_MAX_REQUISICOES_SEGUNDO', 20))
+
+
+class ErroCotacaoRTD(Exception):
+    """Falha ao obter ou interpretar a cotação de um ticker na API RTD"""
+
+
+class LimitadorTaxa:
+    def __init__(self, por_segundo):
+        """
+        Limita o número de requisições por segundo, espaçando-as uniformemente
+
+        Args:
+            por_segundo (float): Máximo de requisições por segundo (0 = sem limite)
+        """
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até que a próxima requisição possa ser feita"""
+        if not self.intervalo:
+            return
+
+        with self._lock:
+            agora = time.monotonic()
+            espera = max(0.0, self._proximo - agora)
+            self._proximo = max(agora, self._proximo) + self.intervalo
+
+        if espera > 0:
+            time.sleep(espera)
+
+
+class ClienteRTD:
+    def __init__(self, api_url, timeout=10, max_concorrencia=RTD_MAX_CONCORRENCIA,
+                 requisicoes_por_segundo=RTD_MAX_REQUISICOES_SEGUNDO):
+        """
+        Cliente da API RTD com conexões reutilizadas (keep-alive) e requisições concorrentes
+
+        Args:
+            api_url (str): URL base da API RTD
+            timeout (float): Tempo máximo de cada requisição em segundos
+            max_concorrencia (int): Número máximo de requisições simultâneas
+            requisicoes_por_segundo (float): Limite de requisições por segundo
+        """
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_concorrencia = max_concorrencia
+
+        # Sessão com pool de conexões do tamanho da concorrência máxima
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max_concorrencia)
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+
+        self._limitador = LimitadorTaxa(requisicoes_por_segundo)
+        self._executor = ThreadPoolExecutor(max_workers=max_concorrencia, thread_name_prefix='rtd')
+
+    def obter_cotacao(self, ticker_rtd, tipo='ULT', limite=None):
+        """
+        Obtém uma cotação da API RTD
+
+        Args:
+            ticker_rtd (str): Ticker na API RTD
+            tipo (str): Tipo de dado (padrão: 'ULT', último preço)
+            limite (float): Instante (time.monotonic) até o qual a resposta ainda é útil
+
+        Returns:
+            float: Valor da cotação
+
+        Raises:
+            ErroCotacaoRTD: Se a requisição falhar, exceder o prazo ou retornar valor não numérico
+        """
+        self._limitador.aguardar()
+
+        timeout = self.timeout
+        if limite is not None:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise ErroCotacaoRTD("Prazo do ciclo excedido")
+            timeout = min(timeout, restante)
+
+        try:
+            response = self.session.get(f"{self.api_url}/{ticker_rtd}/{tipo}", timeout=timeout)
+        except requests.RequestException as e:
+            raise ErroCotacaoRTD(f"Erro na requisição: {str(e)}")
+
+        if response.status_code != 200:
+            raise ErroCotacaoRTD(f"Status HTTP {response.status_code}")
+
+        try:
+            data = response.json()
+        except ValueError:
+            raise ErroCotacaoRTD("Resposta inválida (JSON esperado)")
+
+        # Converter o valor para float, substituindo a vírgula por ponto se necessário
+        price_str = str(data.get('value', '')).replace(',', '.')
+        try:
+            return float(price_str)
+        except ValueError:
+            raise ErroCotacaoRTD(f"Valor não numérico recebido: {price_str}")
+
+    def obter_cotacoes(self, tickers_rtd, tipo='ULT', prazo=None):
+        """
+        Obtém as cotações de vários tickers em paralelo
+
+        Args:
+            tickers_rtd (list): Tickers na API RTD
+            tipo (str): Tipo de dado (padrão: 'ULT')
+            prazo (float): Tempo máximo em segundos para o conjunto das requisições (None = sem prazo)
+
+        Returns:
+            tuple: (cotacoes, erros) com os dicionários ticker -> preço e ticker -> mensagem de erro
+        """
+        limite = time.monotonic() + prazo if prazo else None
+        futuros = {
+            self._executor.submit(self.obter_cotacao, ticker, tipo, limite): ticker
+            for ticker in tickers_rtd
+        }
+
+        concluidos, pendentes = wait(futuros, timeout=prazo)
+
+        cotacoes = {}
+        erros = {}
+        for futuro in concluidos:
+            ticker = futuros[futuro]
+            try:
+                cotacoes[ticker] = futuro.result()
+            except Exception as e:
+                erros[ticker] = str(e)
+
+        for futuro in pendentes:
+            futuro.cancel()
+            erros[futuros[futuro]] = "Prazo do ciclo excedido"
+
+        return cotacoes, erros
+
+    def fechar(self):
+        """Encerra o pool de threads e as conexões abertas"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+# Clientes compartilhados por URL, para reaproveitar conexões entre chamadas
+_clientes = {}
+_lock_clientes = threading.Lock()
+
+def obter_cliente_rtd(api_url, timeout=10):
+    """Retorna o cliente RTD compartilhado para a URL informada, criando-o na primeira chamada"""
+    with _lock_clientes:
+        if api_url not in _clientes:
+            _clientes[api_url] = ClienteRTD(api_url, timeout=timeout)
+        return _clientes[api_url]
@@ -0,0 +1,572 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from armazem_local import armazem_local
+
+# Configurações do cache de séries históricas
+CACHE_HISTORICO_TTL = int(os.environ.get('CACHE_HISTORICO_TTL', 3600))
+CACHE_HISTORICO_MAX_MB = float(os.environ.get('CACHE_HISTORICO_MAX_MB', 256))
+
+# Limite padrão de registros por requisição do Supabase
+TAMANHO_PAGINA = 1000
+
+# Busca da próxima página em segundo plano enquanto a atual é processada
+PREFETCH_PAGINAS = os.environ.get('PREFETCH_PAGINAS', '1').lower() in ('1', 'true', 'sim')
+
+# Colunas de dados_historicos que podem ser projetadas nas consultas
+COLUNAS_HISTORICO = (
+    'id', 'ticker', 'nome_ativo', 'data', 'abertura', 'maxima', 'minima',
+    'fechamento', 'retorno_diario', 'mm20', 'bb2s', 'bb2i'
+)
+
+
+class CacheHistorico:
+    def __init__(self, ttl_segundos=CACHE_HISTORICO_TTL, max_mb=CACHE_HISTORICO_MAX_MB):
+        """
+        Cache LRU em memória com a série histórica completa de cada ticker
+
+        Args:
+            ttl_segundos (int): Tempo de vida de cada série em segundos
+            max_mb (float): Limite de memória ocupada pelas séries em megabytes
+        """
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+        self._series = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+        # Número de séries já armazenadas; identifica cada carga (ver versao())
+        self._cargas = 0
+
+        # Contadores expostos em estatisticas()
+        self.acertos = 0
+        self.falhas = 0
+        self.expirados = 0
+        self.despejados = 0
+        self.invalidacoes = 0
+
+    def obter(self, ticker, contabilizar=True):
+        """Retorna a série em cache para o ticker ou None se ausente/expirada"""
+        with self._lock:
+            entrada = self._series.get(ticker)
+
+            if entrada is None:
+                if contabilizar:
+                    self.falhas += 1
+                return None
+
+            dados, carregado_em, _, _ = entrada
+            if time.time() - carregado_em > self.ttl_segundos:
+                self._remover(ticker)
+                self.expirados += 1
+                if contabilizar:
+                    self.falhas += 1
+                return None
+
+            # Marcar como usado recentemente
+            self._series.move_to_end(ticker)
+            if contabilizar:
+                self.acertos += 1
+            return dados
+
+    def armazenar(self, ticker, dados):
+        """Armazena a série de um ticker, despejando as menos usadas se exceder o limite de memória"""
+        tamanho = int(dados.memory_usage(deep=True).sum())
+
+        with self._lock:
+            if ticker in self._series:
+                self._remover(ticker)
+
+            # Séries maiores que o limite total não são armazenadas
+            if tamanho > self.max_bytes:
+                return
+
+            while self._series and self._bytes + tamanho > self.max_bytes:
+                ticker_antigo = next(iter(self._series))
+                self._remover(ticker_antigo)
+                self.despejados += 1
+
+            self._cargas += 1
+            self._series[ticker] = (dados, time.time(), tamanho, self._cargas)
+            self._bytes += tamanho
+
+    def versao(self, ticker):
+        """
+        Identificador da carga atual da série do ticker, alterado sempre que ela é recarregada
+
+        Permite que caches derivados validem resultados sem manter referências às séries.
+
+        Returns:
+            int: Identificador da carga ou None se o ticker não estiver em cache
+        """
+        with self._lock:
+            entrada = self._series.get(ticker)
+            return entrada[3] if entrada is not None else None
+
+    def invalidar(self, ticker=None):
+        """Remove um ticker do cache (ou todos, se ticker for None)"""
+        with self._lock:
+            if ticker is None:
+                self.invalidacoes += len(self._series)
+                self._series.clear()
+                self._bytes = 0
+            elif ticker in self._series:
+                self._remover(ticker)
+                self.invalidacoes += 1
+
+    def lock_carga(self, ticker):
+        """Lock por ticker para que requisições simultâneas façam uma única carga do banco"""
+        with self._lock:
+            if ticker not in self._locks_carga:
+                self._locks_carga[ticker] = threading.Lock()
+            return self._locks_carga[ticker]
+
+    def estatisticas(self):
+        """Retorna os contadores e a ocupação atual do cache"""
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'tickers': list(self._series.keys()),
+                'total_tickers': len(self._series),
+                'memoria_mb': round(self._bytes / (1024 * 1024), 3),
+                'limite_mb': round(self.max_bytes / (1024 * 1024), 3),
+                'ttl_segundos': self.ttl_segundos,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / total * 100, 2) if total else None,
+                'expirados': self.expirados,
+                'despejados': self.despejados,
+                'invalidacoes': self.invalidacoes
+            }
+
+    def _remover(self, ticker):
+        _, _, tamanho, _ = self._series.pop(ticker)
+        self._bytes -= tamanho
+
+
+# Instância compartilhada por todos os módulos do processo
+cache_historico = CacheHistorico()
+
+
+def varrer_historico(supabase, tickers, data_inicio=None, data_fim=None, selecao='*',
+                     tamanho_pagina=TAMANHO_PAGINA, prefetch=PREFETCH_PAGINAS):
+    """
+    Percorre dados_historicos de um ou mais tickers com paginação por chave (ticker, data)
+
+    Cada página começa após a última chave da anterior (em vez de .range com offset),
+    de modo que o custo de cada consulta não cresce com a profundidade da varredura.
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Lista de tickers
+        data_inicio (str): Data inicial (YYYY-MM-DD), inclusiva
+        data_fim (str): Data final (YYYY-MM-DD), inclusiva
+        selecao (str): Colunas selecionadas (as colunas da chave são incluídas se faltarem)
+        tamanho_pagina (int): Registros por página (não deve exceder o limite do PostgREST)
+        prefetch (bool): Se True, a próxima página é buscada em segundo plano enquanto a
+            atual é processada
+
+    Yields:
+        list: Registros de cada página, ordenados por ticker e data
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return
+
+    varios = len(tickers) > 1
+    if selecao != '*':
+        colunas = [coluna.strip() for coluna in selecao.split(',')]
+        chave = ['ticker', 'data'] if varios else ['data']
+        selecao = ','.join(colunas + [coluna for coluna in chave if coluna not in colunas])
+
+    def buscar(ultima_chave):
+        consulta = supabase.table('dados_historicos').select(selecao)
+        consulta = consulta.in_('ticker', tickers) if varios else consulta.eq('ticker', tickers[0])
+        if data_inicio:
+            consulta = consulta.gte('data', data_inicio)
+        if data_fim:
+            consulta = consulta.lte('data', data_fim)
+
+        if ultima_chave:
+            ticker, data = ultima_chave
+            if varios:
+                # (ticker, data) > (último ticker, última data); tickers entre aspas por causa de '.' e '='
+                consulta = consulta.or_(f'ticker.gt."{ticker}",and(ticker.eq."{ticker}",data.gt.{data})')
+            else:
+                consulta = consulta.gt('data', data)
+
+        if varios:
+            consulta = consulta.order('ticker', desc=False)
+        return consulta.order('data', desc=False).limit(tamanho_pagina).execute().data or []
+
+    def proxima_chave(pagina):
+        if len(pagina) < tamanho_pagina:
+            return None
+        return (pagina[-1].get('ticker', tickers[0]), pagina[-1]['data'])
+
+    if not prefetch:
+        ultima_chave = None
+        while True:
+            pagina = buscar(ultima_chave)
+            if pagina:
+                yield pagina
+            ultima_chave = proxima_chave(pagina)
+            if ultima_chave is None:
+                return
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='varredura') as executor:
+        pagina = buscar(None)
+        while True:
+            ultima_chave = proxima_chave(pagina)
+            seguinte = executor.submit(buscar, ultima_chave) if ultima_chave else None
+            if pagina:
+                yield pagina
+            if seguinte is None:
+                return
+            pagina = seguinte.result()
+
+def carregar_historico_completo(supabase, ticker):
+    """
+    Carrega do banco todos os registros de dados_historicos de um ticker
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        ticker (str): O ticker do ativo
+
+    Returns:
+        pandas.DataFrame: DataFrame indexado por data ou None se não houver registros
+    """
+    # Armazém local (se configurado): leitura do disco após conferir se há registros novos no banco
+    if armazem_local:
+        atualizar_armazem_local(supabase, [ticker])
+        dados = armazem_local.carregar(ticker)
+        if dados is not None or armazem_local.offline or not supabase:
+            return dados
+
+    todos_registros = []
+    for pagina in varrer_historico(supabase, [ticker]):
+        todos_registros.extend(pagina)
+
+    if not todos_registros:
+        return None
+
+    dados = _registros_para_dataframe(todos_registros)
+
+    # Primeira leitura de um ticker ausente do armazém local: guardar a série carregada
+    if armazem_local:
+        armazem_local.gravar(ticker, dados)
+
+    return dados
+
+def obter_historico(supabase, ticker, data_inicio=None, data_fim=None):
+    """
+    Obtém a série histórica de um ticker a partir do cache, carregando do banco apenas na falta
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        ticker (str): O ticker do ativo
+        data_inicio (str): Data inicial (YYYY-MM-DD), inclusiva
+        data_fim (str): Data final (YYYY-MM-DD), inclusiva
+
+    Returns:
+        pandas.DataFrame: Recorte da série indexado por data ou None se não houver registros.
+            O DataFrame é compartilhado com o cache e não deve ser modificado.
+    """
+    dados = cache_historico.obter(ticker)
+
+    if dados is None:
+        with cache_historico.lock_carga(ticker):
+            # Outra requisição pode ter carregado a série enquanto aguardávamos o lock
+            dados = cache_historico.obter(ticker, contabilizar=False)
+            if dados is None:
+                dados = carregar_historico_completo(supabase, ticker)
+                if dados is None:
+                    return None
+                cache_historico.armazenar(ticker, dados)
+
+    return fatiar_periodo(dados, data_inicio, data_fim)
+
+def carregar_historicos_em_lote(supabase, tickers):
+    """
+    Carrega do banco a série completa de vários tickers com uma única consulta paginada
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Lista de tickers
+
+    Returns:
+        dict: Dicionário ticker -> DataFrame indexado por data (apenas tickers com registros)
+    """
+    series = {}
+
+    # Armazém local (se configurado): apenas os tickers ausentes são consultados no banco
+    if armazem_local:
+        atualizar_armazem_local(supabase, tickers)
+        for ticker in tickers:
+            dados = armazem_local.carregar(ticker)
+            if dados is not None:
+                series[ticker] = dados
+
+        tickers = [ticker for ticker in tickers if ticker not in series]
+        if not tickers or armazem_local.offline or not supabase:
+            return series
+
+    todos_registros = []
+    for pagina in varrer_historico(supabase, tickers):
+        todos_registros.extend(pagina)
+
+    if not todos_registros:
+        return series
+
+    df = _registros_para_dataframe(todos_registros)
+    for ticker, dados in df.groupby('ticker', sort=False):
+        series[ticker] = dados
+        if armazem_local:
+            armazem_local.gravar(ticker, dados)
+
+    return series
+
+def sincronizar_armazem_local(supabase, tickers):
+    """
+    Copia para o armazém local os registros de dados_historicos posteriores à última data local
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Lista de tickers a sincronizar
+
+    Returns:
+        dict: Dicionário ticker -> número de registros novos (vazio se o armazém estiver desativado)
+    """
+    if not armazem_local:
+        return {}
+
+    novos = {}
+    for ticker in tickers:
+        ultima_data = armazem_local.ultima_data(ticker)
+
+        # Apenas as datas posteriores à última data local
+        data_inicio = str(np.datetime64(ultima_data, 'D') + 1) if ultima_data else None
+
+        registros = []
+        for pagina in varrer_historico(supabase, [ticker], data_inicio):
+            registros.extend(pagina)
+
+        if registros:
+            armazem_local.gravar(ticker, _registros_para_dataframe(registros))
+        armazem_local.marcar_verificado([ticker])
+        novos[ticker] = len(registros)
+
+    return novos
+
+def atualizar_armazem_local(supabase, tickers):
+    """
+    Traz para o armazém local os registros gravados no banco por outros processos
+
+    Apenas os tickers já presentes no armazém cuja última verificação venceu são conferidos,
+    com uma única varredura a partir da menor das suas últimas datas locais. Se o banco
+    estiver indisponível, a série local continua sendo usada até a próxima verificação.
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Lista de tickers lidos do armazém
+
+    Returns:
+        int: Número de registros novos gravados no armazém
+    """
+    if not armazem_local or armazem_local.offline or not supabase:
+        return 0
+
+    ultimas_datas = {}
+    for ticker in dict.fromkeys(tickers):
+        if armazem_local.verificacao_pendente(ticker):
+            ultima_data = armazem_local.ultima_data(ticker)
+            if ultima_data:
+                ultimas_datas[ticker] = np.datetime64(ultima_data, 'D')
+
+    if not ultimas_datas:
+        return 0
+
+    data_inicio = str(min(ultimas_datas.values()) + 1)
+    try:
+        registros = []
+        for pagina in varrer_historico(supabase, list(ultimas_datas), data_inicio):
+            registros.extend(pagina)
+    except Exception as e:
+        print(f"⚠️ Erro ao verificar registros novos para o armazém local: {str(e)}")
+        armazem_local.marcar_verificado(ultimas_datas)
+        return 0
+
+    novos = 0
+    if registros:
+        df = _registros_para_dataframe(registros)
+        for ticker, dados in df.groupby('ticker', sort=False):
+            dados = dados[dados.index.values.astype('datetime64[D]') > ultimas_datas[ticker]]
+            if not dados.empty:
+                armazem_local.gravar(ticker, dados)
+                novos += len(dados)
+
+    armazem_local.marcar_verificado(ultimas_datas)
+    return novos
+
+def obter_historicos(supabase, tickers, data_inicio=None, data_fim=None):
+    """
+    Obtém as séries de vários tickers, buscando no banco apenas os ausentes do cache (em lote)
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Lista de tickers
+        data_inicio (str): Data inicial (YYYY-MM-DD), inclusiva
+        data_fim (str): Data final (YYYY-MM-DD), inclusiva
+
+    Returns:
+        dict: Dicionário ticker -> recorte da série (apenas tickers com registros)
+    """
+    series = {}
+    ausentes = []
+
+    for ticker in dict.fromkeys(tickers):
+        dados = cache_historico.obter(ticker)
+        if dados is None:
+            ausentes.append(ticker)
+        else:
+            series[ticker] = dados
+
+    if ausentes:
+        for ticker, dados in carregar_historicos_em_lote(supabase, ausentes).items():
+            cache_historico.armazenar(ticker, dados)
+            series[ticker] = dados
+
+    return {
+        ticker: fatiar_periodo(series[ticker], data_inicio, data_fim)
+        for ticker in dict.fromkeys(tickers) if ticker in series
+    }
+
+def iterar_historico(supabase, ticker, data_inicio=None, data_fim=None, colunas=None):
+    """
+    Percorre a série de um ticker em blocos de até TAMANHO_PAGINA registros, sem montar a
+    resposta inteira em memória
+
+    Se a série estiver no cache, os blocos são recortes dela; se estiver no armazém local,
+    são recortes sem cópia do arquivo mapeado, convertidos um bloco por vez; caso contrário,
+    cada página do banco é repassada assim que chega, já com a projeção de colunas.
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        ticker (str): O ticker do ativo
+        data_inicio (str): Data inicial (YYYY-MM-DD), inclusiva
+        data_fim (str): Data final (YYYY-MM-DD), inclusiva
+        colunas (list): Colunas a incluir além da data (padrão: todas)
+
+    Yields:
+        list: Lista de dicionários no mesmo formato retornado pelo Supabase
+    """
+    dados = cache_historico.obter(ticker)
+
+    if dados is None and armazem_local:
+        atualizar_armazem_local(supabase, [ticker])
+        recorte = armazem_local.fatia(ticker, data_inicio, data_fim)
+        if recorte is not None or armazem_local.offline or not supabase:
+            for inicio in range(0, len(recorte) if recorte is not None else 0, TAMANHO_PAGINA):
+                bloco = armazem_local.para_dataframe(ticker, recorte[inicio:inicio + TAMANHO_PAGINA])
+                yield para_registros(bloco, colunas)
+            return
+
+    if dados is not None:
+        recorte = fatiar_periodo(dados, data_inicio, data_fim)
+        for inicio in range(0, len(recorte), TAMANHO_PAGINA):
+            yield para_registros(recorte.iloc[inicio:inicio + TAMANHO_PAGINA], colunas)
+        return
+
+    if not supabase:
+        return
+
+    # Série fora do cache: repassar as páginas do banco à medida que chegam
+    selecao = ','.join(['data'] + [coluna for coluna in colunas if coluna != 'data']) if colunas else '*'
+    yield from varrer_historico(supabase, [ticker], data_inicio, data_fim, selecao)
+
+def obter_matriz_precos(supabase, tickers, data_inicio=None, data_fim=None, coluna='fechamento'):
+    """
+    Monta a matriz data x ticker de uma coluna de preços para vários ativos
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Lista de tickers
+        data_inicio (str): Data inicial (YYYY-MM-DD), inclusiva
+        data_fim (str): Data final (YYYY-MM-DD), inclusiva
+        coluna (str): Coluna de dados_historicos usada (padrão: 'fechamento')
+
+    Returns:
+        tuple: (datas, tickers, matriz) onde datas é um numpy.ndarray datetime64 com a união
+            das datas, tickers é a lista de colunas encontradas e matriz é um numpy.ndarray
+            float (datas x tickers) com NaN onde o ativo não tem registro
+    """
+    series = obter_historicos(supabase, tickers, data_inicio, data_fim)
+    series = {ticker: dados for ticker, dados in series.items() if not dados.empty}
+    return montar_matriz(series, coluna)
+
+def montar_matriz(series, coluna='fechamento'):
+    """Alinha séries indexadas por data em uma matriz data x ticker (NaN onde não há registro)"""
+    colunas = list(series.keys())
+
+    if not colunas:
+        return np.array([], dtype='datetime64[ns]'), [], np.empty((0, 0))
+
+    datas = np.unique(np.concatenate([dados.index.values for dados in series.values()]))
+    matriz = np.full((len(datas), len(colunas)), np.nan)
+
+    for j, ticker in enumerate(colunas):
+        dados = series[ticker]
+        linhas = np.searchsorted(datas, dados.index.values)
+        matriz[linhas, j] = pd.to_numeric(dados[coluna], errors='coerce').to_numpy(dtype=float)
+
+    return datas, colunas, matriz
+
+def preencher_adiante(matriz):
+    """Preenche os NaN de cada coluna com o último valor válido anterior (forward fill vetorizado)"""
+    linhas = np.arange(matriz.shape[0])[:, None]
+    indices = np.where(np.isnan(matriz), 0, linhas)
+    np.maximum.accumulate(indices, axis=0, out=indices)
+    return matriz[indices, np.arange(matriz.shape[1])]
+
+def fatiar_periodo(dados, data_inicio=None, data_fim=None):
+    """Recorta um DataFrame indexado por data ao intervalo [data_inicio, data_fim]"""
+    inicio = pd.Timestamp(data_inicio) if data_inicio else None
+    fim = pd.Timestamp(data_fim) if data_fim else None
+    return dados.loc[inicio:fim]
+
+def para_registros(dados, colunas=None):
+    """
+    Converte um DataFrame de dados históricos em registros serializáveis em JSON
+
+    Args:
+        dados (pandas.DataFrame): DataFrame indexado por data
+        colunas (list): Colunas a incluir além da data (padrão: todas)
+
+    Returns:
+        list: Lista de dicionários no mesmo formato retornado pelo Supabase
+    """
+    if dados is None or dados.empty:
+        return []
+
+    if colunas is not None:
+        dados = dados[[coluna for coluna in colunas if coluna in dados.columns and coluna != 'data']]
+
+    dados = dados.reset_index()
+    dados['data'] = dados['data'].dt.strftime('%Y-%m-%d')
+
+    # Converter NaN para None para gerar JSON válido
+    dados = dados.astype(object).where(pd.notna(dados), None)
+
+    return dados.to_dict('records')
+
+def _registros_para_dataframe(registros):
+    """Converte registros do Supabase em DataFrame indexado e ordenado por data"""
+    df = pd.DataFrame(registros)
+    df['data'] = pd.to_datetime(df['data'])
+    df.set_index('data', inplace=True)
+    return df.sort_index()
@@ -0,0 +1,184 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Dependências opcionais: sem elas os formatos correspondentes ficam indisponíveis
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Formatos colunares: uma lista de valores por coluna, sem repetir nomes de colunas nem ticker/nome_ativo
+TIPOS_MIDIA = {
+    'colunar': 'application/vnd.colunar+json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Tipos aceitos no cabeçalho Accept além dos canônicos
+SINONIMOS_MIDIA = {
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack'
+}
+
+# Colunas constantes em uma série de um único ticker, enviadas uma vez como metadados
+COLUNAS_CONSTANTES = ('ticker', 'nome_ativo')
+
+
+class FormatoIndisponivel(Exception):
+    """Formato reconhecido, mas cuja dependência opcional não está instalada"""
+
+
+def formato_disponivel(formato):
+    """Verifica se o formato colunar pode ser gerado no ambiente atual"""
+    if formato == 'msgpack':
+        return msgpack is not None
+    if formato == 'arrow':
+        return pa is not None
+    return formato in TIPOS_MIDIA
+
+def negociar_formato(formato, aceitos, padrao='json', outros=()):
+    """
+    Escolhe o formato da resposta pelo parâmetro 'formato' ou, na sua ausência, pelo cabeçalho Accept
+
+    Args:
+        formato (str): Valor do parâmetro 'formato' (None = negociar pelo Accept)
+        aceitos: Tipos aceitos pelo cliente (request.accept_mimetypes)
+        padrao (str): Formato usado quando o cliente não pede um formato colunar
+        outros (tuple): Formatos não colunares também aceitos pela rota (ex.: 'ndjson')
+
+    Returns:
+        str: 'json', um dos formatos de TIPOS_MIDIA ou um dos outros formatos
+
+    Raises:
+        ValueError: Se o formato pedido não existir
+        FormatoIndisponivel: Se o formato pedido depender de um pacote não instalado
+    """
+    if formato:
+        if formato not in TIPOS_MIDIA and formato != padrao and formato not in outros:
+            validos = [padrao, *outros, *TIPOS_MIDIA]
+            raise ValueError(f"Formato inválido. Use {', '.join(validos)}")
+        if formato in TIPOS_MIDIA and not formato_disponivel(formato):
+            raise FormatoIndisponivel(f"Formato '{formato}' indisponível: instale o pacote {'pyarrow' if formato == 'arrow' else 'msgpack'}")
+        return formato
+
+    # Pelo Accept, só são oferecidos os formatos disponíveis; sem preferência explícita vale o padrão
+    oferecidos = {'application/json': padrao}
+    tipos = [(tipo, nome) for nome, tipo in TIPOS_MIDIA.items()] + list(SINONIMOS_MIDIA.items())
+    for tipo, nome in tipos:
+        if formato_disponivel(nome):
+            oferecidos[tipo] = nome
+
+    escolhido = aceitos.best_match(list(oferecidos), default='application/json') if aceitos else None
+    return oferecidos.get(escolhido, padrao)
+
+def colunas_historico(dados, colunas=None):
+    """
+    Separa um DataFrame de dados históricos de um ticker em colunas
+
+    Args:
+        dados (pandas.DataFrame): DataFrame indexado por data
+        colunas (list): Colunas a incluir além da data (padrão: todas)
+
+    Returns:
+        tuple: (metadados, colunas) onde metadados traz ticker e nome_ativo (constantes na série)
+            e colunas é um dicionário nome -> numpy.ndarray, começando pela data (datetime64[D])
+    """
+    selecionadas = [coluna for coluna in (colunas or (dados.columns if dados is not None else []))
+                    if coluna != 'data']
+    resultado = {'data': np.array([], dtype='datetime64[D]')}
+    metadados = {}
+
+    if dados is None or dados.empty:
+        for coluna in selecionadas:
+            if coluna not in COLUNAS_CONSTANTES:
+                resultado[coluna] = np.array([], dtype=float)
+        return metadados, resultado
+
+    resultado['data'] = pd.DatetimeIndex(dados.index).values.astype('datetime64[D]')
+
+    for coluna in selecionadas:
+        if coluna not in dados.columns:
+            continue
+        if coluna in COLUNAS_CONSTANTES:
+            valores = dados[coluna].dropna()
+            metadados[coluna] = valores.iloc[-1] if not valores.empty else None
+        elif coluna == 'id':
+            resultado[coluna] = pd.to_numeric(dados[coluna], errors='coerce').fillna(-1).to_numpy(dtype='i8')
+        else:
+            resultado[coluna] = pd.to_numeric(dados[coluna], errors='coerce').to_numpy(dtype=float)
+
+    return metadados, resultado
+
+def colunas_matriz(datas, tickers, matriz):
+    """
+    Converte uma matriz data x ticker em colunas (uma por ticker), compartilhando o eixo de datas
+
+    Returns:
+        dict: Dicionário nome -> numpy.ndarray, começando pela data (datetime64[D])
+    """
+    resultado = {'data': np.asarray(datas).astype('datetime64[D]')}
+    for j, ticker in enumerate(tickers):
+        resultado[ticker] = matriz[:, j]
+    return resultado
+
+def _lista(valores):
+    """Converte uma coluna em lista serializável (datas como 'YYYY-MM-DD', NaN como None)"""
+    if np.issubdtype(valores.dtype, np.datetime64):
+        return np.datetime_as_string(valores, unit='D').tolist()
+
+    if not np.issubdtype(valores.dtype, np.floating):
+        return valores.tolist()
+
+    lista = valores.astype(object)
+    lista[np.isnan(valores)] = None
+    return lista.tolist()
+
+def _tabela_arrow(metadados, colunas):
+    """Monta uma tabela Arrow com as colunas e os metadados no schema"""
+    campos = {}
+    for nome, valores in colunas.items():
+        if np.issubdtype(valores.dtype, np.datetime64):
+            campos[nome] = pa.array(valores, type=pa.date32())
+        elif np.issubdtype(valores.dtype, np.integer):
+            campos[nome] = pa.array(valores, type=pa.int64())
+        else:
+            campos[nome] = pa.array(valores, type=pa.float64(), from_pandas=True)
+
+    tabela = pa.table(campos)
+    if metadados:
+        tabela = tabela.replace_schema_metadata({
+            chave: json.dumps(valor, ensure_ascii=False) for chave, valor in metadados.items()
+        })
+    return tabela
+
+def serializar_colunar(metadados, colunas, formato):
+    """
+    Serializa colunas em um formato colunar
+
+    Args:
+        metadados (dict): Valores constantes da resposta (ex.: ticker, nome_ativo)
+        colunas (dict): Dicionário nome -> numpy.ndarray
+        formato (str): 'colunar', 'msgpack' ou 'arrow'
+
+    Returns:
+        tuple: (corpo, tipo de mídia)
+    """
+    if formato == 'arrow':
+        tabela = _tabela_arrow(metadados, colunas)
+        destino = pa.BufferOutputStream()
+        with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        return destino.getvalue().to_pybytes(), TIPOS_MIDIA[formato]
+
+    corpo = dict(metadados, colunas={nome: _lista(valores) for nome, valores in colunas.items()})
+
+    if formato == 'msgpack':
+        return msgpack.packb(corpo, use_bin_type=True), TIPOS_MIDIA[formato]
+
+    return json.dumps(corpo, ensure_ascii=False), TIPOS_MIDIA['colunar']
@@ -0,0 +1,180 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Número máximo de tarefas executadas simultaneamente (as demais aguardam na fila)
+TAREFAS_MAX_WORKERS = int(os.environ.get('TAREFAS_MAX_WORKERS', 2))
+# Número de tarefas finalizadas mantidas para consulta
+TAREFAS_HISTORICO_MAX = int(os.environ.get('TAREFAS_HISTORICO_MAX', 100))
+
+# Situações de uma tarefa
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+
+class Tarefa:
+    def __init__(self, tipo, parametros=None):
+        """
+        Execução em segundo plano acompanhada por id
+
+        Args:
+            tipo (str): Tipo da tarefa (ex.: 'precos_rtd', 'ingestao'); por padrão, no máximo uma ativa por tipo
+            parametros (dict): Parâmetros da execução, devolvidos na consulta
+        """
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.parametros = parametros or {}
+        self.status = PENDENTE
+        self.criada_em = datetime.now().isoformat()
+        self.iniciada_em = None
+        self.finalizada_em = None
+        self.progresso = {}
+        self.resultado = None
+        self.erro = None
+        self._futuro = None
+        self._lock = threading.Lock()
+
+    @property
+    def ativa(self):
+        return self.status in (PENDENTE, EXECUTANDO)
+
+    def atualizar_progresso(self, **valores):
+        """Atualiza os campos de progresso exibidos na consulta da tarefa"""
+        with self._lock:
+            self.progresso.update(valores)
+
+    def aguardar(self, timeout=None):
+        """
+        Bloqueia até o fim da tarefa
+
+        Returns:
+            object: Resultado da função executada
+
+        Raises:
+            Exception: A exceção lançada pela função executada
+        """
+        return self._futuro.result(timeout)
+
+    def para_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'tipo': self.tipo,
+                'status': self.status,
+                'parametros': self.parametros,
+                'criada_em': self.criada_em,
+                'iniciada_em': self.iniciada_em,
+                'finalizada_em': self.finalizada_em,
+                'progresso': dict(self.progresso),
+                'resultado': self.resultado,
+                'erro': self.erro
+            }
+
+
+class GerenciadorTarefas:
+    def __init__(self, max_workers=TAREFAS_MAX_WORKERS, max_historico=TAREFAS_HISTORICO_MAX):
+        """
+        Executa tarefas em um pool limitado de threads, com no máximo uma tarefa ativa
+        (pendente ou executando) por chave (por padrão, o tipo da tarefa)
+
+        Args:
+            max_workers (int): Número máximo de tarefas simultâneas
+            max_historico (int): Número de tarefas finalizadas mantidas para consulta
+        """
+        self.max_workers = max_workers
+        self.max_historico = max_historico
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tarefa')
+        self._tarefas = OrderedDict()
+        self._ativas = {}
+        self._lock = threading.Lock()
+
+        # Estatísticas
+        self.submetidas = 0
+        self.deduplicadas = 0
+
+    def submeter(self, tipo, funcao, *args, parametros=None, chave=None, **kwargs):
+        """
+        Agenda funcao(tarefa, *args, **kwargs) no pool, a menos que já haja uma tarefa ativa com a mesma chave
+
+        Args:
+            tipo (str): Tipo da tarefa
+            funcao (callable): Função executada; recebe a tarefa como primeiro argumento para
+                informar o progresso
+            parametros (dict): Parâmetros exibidos na consulta da tarefa
+            chave (str): Chave de deduplicação, para tarefas do mesmo tipo com alvos diferentes
+                (padrão: o tipo)
+
+        Returns:
+            tuple: (tarefa, nova) onde nova é False se uma tarefa ativa com a mesma chave foi reaproveitada
+        """
+        chave = chave or tipo
+        with self._lock:
+            ativa = self._ativas.get(chave)
+            if ativa is not None and ativa.ativa:
+                self.deduplicadas += 1
+                return ativa, False
+
+            tarefa = Tarefa(tipo, parametros)
+            self._tarefas[tarefa.id] = tarefa
+            self._ativas[chave] = tarefa
+            self.submetidas += 1
+            self._descartar_antigas()
+
+            tarefa._futuro = self._executor.submit(self._executar, tarefa, funcao, args, kwargs)
+            return tarefa, True
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        with tarefa._lock:
+            tarefa.status = EXECUTANDO
+            tarefa.iniciada_em = datetime.now().isoformat()
+
+        try:
+            resultado = funcao(tarefa, *args, **kwargs)
+        except BaseException as e:
+            with tarefa._lock:
+                tarefa.status = FALHOU
+                tarefa.erro = str(e) or e.__class__.__name__
+                tarefa.finalizada_em = datetime.now().isoformat()
+            print(f"⚠️ Tarefa {tarefa.tipo} ({tarefa.id}) falhou: {tarefa.erro}")
+            raise
+
+        with tarefa._lock:
+            tarefa.status = CONCLUIDA
+            tarefa.resultado = resultado
+            tarefa.finalizada_em = datetime.now().isoformat()
+        return resultado
+
+    def _descartar_antigas(self):
+        """Remove as tarefas finalizadas mais antigas além do limite (chamado com o lock adquirido)"""
+        finalizadas = [id_tarefa for id_tarefa, tarefa in self._tarefas.items() if not tarefa.ativa]
+        for id_tarefa in finalizadas[:max(0, len(finalizadas) - self.max_historico)]:
+            del self._tarefas[id_tarefa]
+
+    def obter(self, id_tarefa):
+        """Retorna a tarefa com o id informado ou None"""
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def listar(self, tipo=None):
+        """Lista as tarefas conhecidas (mais recentes primeiro), opcionalmente de um único tipo"""
+        with self._lock:
+            tarefas = list(self._tarefas.values())
+        return [tarefa for tarefa in reversed(tarefas) if tipo is None or tarefa.tipo == tipo]
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'submetidas': self.submetidas,
+                'deduplicadas': self.deduplicadas,
+                'ativas': {chave: tarefa.id for chave, tarefa in self._ativas.items() if tarefa.ativa}
+            }
+
+
+# Instância compartilhada pelas rotas da API
+gerenciador_tarefas = GerenciadorTarefas()
@@ -0,0 +1,438 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from dados_mercado import cache_historico
+
+# Parâmetros das Bandas de Bollinger gravadas em dados_historicos
+JANELA_BOLLINGER = 20
+DESVIOS_BOLLINGER = 2
+
+# Convenções usadas na anualização
+DIAS_UTEIS_ANO = 252
+
+# Número máximo de resultados de indicadores mantidos em cache
+CACHE_INDICADORES_MAX = int(os.environ.get('CACHE_INDICADORES_MAX', 512))
+
+# Tamanho do bloco usado no filtro exponencial vetorizado
+TAMANHO_BLOCO_FILTRO = 64
+
+
+class JanelaMovel:
+    def __init__(self, janela=JANELA_BOLLINGER, historico=None):
+        """
+        Estado de uma janela móvel (média e desvio padrão amostral) que pode ser
+        continuado a partir dos últimos preços já gravados
+
+        Args:
+            janela (int): Tamanho da janela em períodos
+            historico (array-like): Preços anteriores em ordem crescente de data;
+                apenas os últimos janela - 1 são mantidos
+        """
+        self.janela = janela
+        self.ultimos = np.empty(0)
+        if historico is not None and janela > 1:
+            self.ultimos = np.asarray(historico, dtype=float)[-(janela - 1):]
+
+    def atualizar(self, precos):
+        """
+        Calcula a média e o desvio padrão da janela terminando em cada novo preço
+
+        As somas e somas dos quadrados da janela são obtidas por diferença de somas
+        acumuladas, em O(novos preços). Os valores são deslocados pelo primeiro preço
+        da série para evitar perda de precisão na variância. Janelas incompletas ou
+        com preços ausentes resultam em NaN, como em pandas.Series.rolling.
+
+        Args:
+            precos (array-like): Novos preços em ordem crescente de data
+
+        Returns:
+            tuple: (medias, desvios) alinhados aos novos preços
+        """
+        precos = np.asarray(precos, dtype=float)
+        n = self.janela
+        serie = np.concatenate([self.ultimos, precos])
+
+        medias = np.full(len(precos), np.nan)
+        desvios = np.full(len(precos), np.nan)
+
+        if len(precos) and n > 1:
+            ausentes = np.isnan(serie)
+            finitos = serie[~ausentes]
+            deslocamento = finitos[0] if len(finitos) else 0.0
+            x = np.where(ausentes, 0.0, serie - deslocamento)
+
+            soma = np.concatenate([[0.0], np.cumsum(x)])
+            soma_quadrados = np.concatenate([[0.0], np.cumsum(x * x)])
+            contagem_ausentes = np.concatenate([[0], np.cumsum(ausentes)])
+
+            # Janela [fim - n, fim) para cada novo preço
+            fim = np.arange(len(self.ultimos) + 1, len(serie) + 1)
+            inicio = fim - n
+            validos = inicio >= 0
+            fim, inicio = fim[validos], inicio[validos]
+            completas = contagem_ausentes[fim] - contagem_ausentes[inicio] == 0
+
+            s1 = soma[fim] - soma[inicio]
+            s2 = soma_quadrados[fim] - soma_quadrados[inicio]
+            variancia = np.maximum((s2 - s1 * s1 / n) / (n - 1), 0.0)
+
+            medias[validos] = np.where(completas, s1 / n + deslocamento, np.nan)
+            desvios[validos] = np.where(completas, np.sqrt(variancia), np.nan)
+
+        if n > 1:
+            self.ultimos = serie[-(n - 1):]
+        return medias, desvios
+
+
+def calcular_bollinger(fechamentos, historico=None, janela=JANELA_BOLLINGER, desvios=DESVIOS_BOLLINGER):
+    """
+    Calcula a média móvel e as Bandas de Bollinger dos novos fechamentos,
+    continuando a janela a partir dos fechamentos já gravados
+
+    Args:
+        fechamentos (array-like): Novos fechamentos em ordem crescente de data
+        historico (array-like): Fechamentos anteriores já gravados (pelo menos janela - 1
+            para que as primeiras bandas não fiquem vazias)
+        janela (int): Tamanho da janela em períodos
+        desvios (float): Número de desvios padrão das bandas
+
+    Returns:
+        tuple: (mm, banda_superior, banda_inferior) alinhados aos novos fechamentos
+    """
+    media, desvio = JanelaMovel(janela, historico).atualizar(fechamentos)
+    return media, media + desvios * desvio, media - desvios * desvio
+
+
+def carregar_fechamentos_anteriores(supabase, ticker, data_inicio, quantidade=JANELA_BOLLINGER - 1):
+    """
+    Carrega os últimos fechamentos gravados antes de uma data, usados para semear a janela móvel
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        ticker (str): O ticker do ativo
+        data_inicio (str): Data do primeiro registro novo ('YYYY-MM-DD')
+        quantidade (int): Número de fechamentos a carregar
+
+    Returns:
+        numpy.ndarray: Fechamentos em ordem crescente de data (vazio se não houver histórico)
+    """
+    response = supabase.table('dados_historicos') \
+        .select('data,fechamento') \
+        .eq('ticker', ticker) \
+        .lt('data', data_inicio) \
+        .order('data', desc=True) \
+        .limit(quantidade) \
+        .execute()
+
+    fechamentos = [
+        registro['fechamento'] if registro['fechamento'] is not None else np.nan
+        for registro in reversed(response.data or [])
+    ]
+    return np.asarray(fechamentos, dtype=float)
+
+
+# =========================
+# Kernels de indicadores (arrays NumPy em ordem crescente de data)
+# =========================
+
+def _filtro_exponencial(x, alfa, inicial):
+    """
+    Aplica y[t] = (1 - alfa) * y[t-1] + alfa * x[t] partindo de y[-1] = inicial
+
+    A recorrência é resolvida em blocos: dentro de cada bloco o resultado é um produto
+    por uma matriz triangular de pesos, e apenas o último valor passa ao bloco seguinte.
+    Valores ausentes (NaN) não entram no filtro: o estado é mantido e o resultado na
+    posição fica NaN, sem contaminar os demais valores do bloco.
+    """
+    n = len(x)
+    ausentes = np.isnan(x)
+    if ausentes.any():
+        resultado = np.full(n, np.nan)
+        resultado[~ausentes] = _filtro_exponencial(x[~ausentes], alfa, inicial)
+        return resultado
+
+    resultado = np.empty(n)
+    if n == 0:
+        return resultado
+
+    tamanho = min(TAMANHO_BLOCO_FILTRO, n)
+    k = np.arange(tamanho)
+    decaimento = 1.0 - alfa
+    with np.errstate(under='ignore'):
+        pesos = np.tril(decaimento ** np.maximum(k[:, None] - k[None, :], 0)) * alfa
+        pesos_inicial = decaimento ** (k + 1)
+
+    anterior = inicial
+    for inicio in range(0, n, tamanho):
+        bloco = x[inicio:inicio + tamanho]
+        m = len(bloco)
+        y = pesos[:m, :m] @ bloco + pesos_inicial[:m] * anterior
+        resultado[inicio:inicio + m] = y
+        anterior = y[-1]
+
+    return resultado
+
+def _media_exponencial(x, periodo, alfa):
+    """Média exponencial semeada com a média simples dos primeiros 'periodo' valores (NaN antes disso)"""
+    x = np.asarray(x, dtype=float)
+    resultado = np.full(len(x), np.nan)
+    if periodo < 1 or len(x) < periodo:
+        return resultado
+
+    iniciais = x[:periodo][~np.isnan(x[:periodo])]
+    if len(iniciais) == 0:
+        return resultado
+
+    semente = iniciais.mean()
+    resultado[periodo - 1] = semente
+    resultado[periodo:] = _filtro_exponencial(x[periodo:], alfa, semente)
+    return resultado
+
+def ema(fechamento, periodo=20):
+    """Média móvel exponencial"""
+    return {'': _media_exponencial(fechamento, periodo, 2.0 / (periodo + 1))}
+
+def rsi(fechamento, periodo=14):
+    """Índice de força relativa com a suavização de Wilder (0 a 100)"""
+    variacoes = np.diff(np.asarray(fechamento, dtype=float))
+    ganhos = _media_exponencial(np.maximum(variacoes, 0), periodo, 1.0 / periodo)
+    perdas = _media_exponencial(np.maximum(-variacoes, 0), periodo, 1.0 / periodo)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valores = np.where(perdas == 0, 100.0, 100 - 100 / (1 + ganhos / perdas))
+    valores[np.isnan(ganhos)] = np.nan
+
+    return {'': np.concatenate([[np.nan], valores])}
+
+def macd(fechamento, rapida=12, lenta=26, sinal=9):
+    """MACD (diferença entre médias exponenciais), linha de sinal e histograma"""
+    linha = ema(fechamento, rapida)[''] - ema(fechamento, lenta)['']
+
+    linha_sinal = np.full(len(linha), np.nan)
+    validos = np.flatnonzero(~np.isnan(linha))
+    if len(validos):
+        linha_sinal[validos[0]:] = ema(linha[validos[0]:], sinal)['']
+
+    return {'': linha, 'sinal': linha_sinal, 'histograma': linha - linha_sinal}
+
+def atr(fechamento, maxima, minima, periodo=14):
+    """Average True Range com a suavização de Wilder"""
+    fechamento = np.asarray(fechamento, dtype=float)
+    maxima = np.asarray(maxima, dtype=float)
+    minima = np.asarray(minima, dtype=float)
+
+    anterior = np.concatenate([[np.nan], fechamento[:-1]])
+    amplitude = np.fmax(maxima - minima, np.fmax(np.abs(maxima - anterior), np.abs(minima - anterior)))
+
+    return {'': _media_exponencial(amplitude, periodo, 1.0 / periodo)}
+
+def volatilidade_movel(fechamento, janela=21):
+    """Volatilidade anualizada (%) dos retornos diários em uma janela móvel"""
+    fechamento = np.asarray(fechamento, dtype=float)
+    retornos = fechamento[1:] / fechamento[:-1] - 1
+    _, desvios = JanelaMovel(janela).atualizar(retornos)
+    return {'': np.concatenate([[np.nan], desvios * np.sqrt(DIAS_UTEIS_ANO) * 100])}
+
+def correlacao_movel(fechamento, referencia, janela=63):
+    """Correlação móvel dos retornos diários com uma série de referência alinhada às mesmas datas"""
+    x = np.asarray(fechamento, dtype=float)
+    y = np.asarray(referencia, dtype=float)
+    rx = x[1:] / x[:-1] - 1
+    ry = y[1:] / y[:-1] - 1
+
+    resultado = np.full(len(x), np.nan)
+    if len(rx) < janela:
+        return {'': resultado}
+
+    ausentes = np.isnan(rx) | np.isnan(ry)
+    rx = np.where(ausentes, 0.0, rx)
+    ry = np.where(ausentes, 0.0, ry)
+
+    def soma_janela(v):
+        acumulada = np.concatenate([[0.0], np.cumsum(v)])
+        return acumulada[janela:] - acumulada[:-janela]
+
+    sx, sy = soma_janela(rx), soma_janela(ry)
+    sxx, syy, sxy = soma_janela(rx * rx), soma_janela(ry * ry), soma_janela(rx * ry)
+    completas = soma_janela(ausentes.astype(float)) == 0
+
+    covariancia = sxy - sx * sy / janela
+    variancia_x = sxx - sx * sx / janela
+    variancia_y = syy - sy * sy / janela
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlacao = covariancia / np.sqrt(variancia_x * variancia_y)
+
+    resultado[janela:] = np.where(completas, np.clip(correlacao, -1, 1), np.nan)
+    return {'': resultado}
+
+
+# Indicadores disponíveis: nome -> (função, parâmetros em ordem com seus valores padrão)
+# Os parâmetros são informados na consulta separados por ':' (ex.: 'macd:12:26:9', 'corr:63:IVVB11.SA')
+INDICADORES = {
+    'ema': (ema, (('periodo', 20),)),
+    'rsi': (rsi, (('periodo', 14),)),
+    'macd': (macd, (('rapida', 12), ('lenta', 26), ('sinal', 9))),
+    'atr': (atr, (('periodo', 14),)),
+    'vol': (volatilidade_movel, (('janela', 21),)),
+    'corr': (correlacao_movel, (('janela', 63), ('referencia', 'BOVA11.SA')))
+}
+
+def interpretar_indicadores(texto):
+    """
+    Converte o parâmetro de consulta 'indicadores' em especificações
+
+    Args:
+        texto (str): Lista separada por vírgulas, como 'ema:50,rsi,macd:12:26:9'
+
+    Returns:
+        list: Lista de tuplas (nome, parametros) com os parâmetros completos
+
+    Raises:
+        ValueError: Se um indicador for desconhecido ou um parâmetro for inválido
+    """
+    especificacoes = []
+
+    for item in texto.split(','):
+        partes = [parte.strip() for parte in item.strip().split(':')]
+        nome = partes[0].lower()
+        if not nome:
+            continue
+        if nome not in INDICADORES:
+            raise ValueError(f"Indicador desconhecido: {nome}. Use {', '.join(INDICADORES)}")
+
+        _, definicao = INDICADORES[nome]
+        valores = partes[1:]
+        if len(valores) > len(definicao):
+            raise ValueError(f"Parâmetros demais para {nome}: use {nome}:" + ':'.join(p for p, _ in definicao))
+
+        parametros = []
+        for (parametro, padrao), valor in zip(definicao, valores + [None] * len(definicao)):
+            if valor is None or valor == '':
+                parametros.append((parametro, padrao))
+            elif isinstance(padrao, int):
+                try:
+                    numero = int(valor)
+                except ValueError:
+                    raise ValueError(f"Parâmetro '{parametro}' de {nome} deve ser inteiro: {valor}")
+                if numero < 1:
+                    raise ValueError(f"Parâmetro '{parametro}' de {nome} deve ser positivo")
+                parametros.append((parametro, numero))
+            else:
+                parametros.append((parametro, valor))
+
+        especificacoes.append((nome, tuple(parametros)))
+
+    return especificacoes
+
+def nome_coluna(nome, parametros, sufixo=''):
+    """Nome da coluna de um indicador, como 'ema_50' ou 'macd_12_26_9_sinal'"""
+    partes = [nome] + [str(valor) for _, valor in parametros]
+    if sufixo:
+        partes.append(sufixo)
+    return '_'.join(partes)
+
+
+class CacheIndicadores:
+    def __init__(self, max_entradas=CACHE_INDICADORES_MAX):
+        """
+        Cache LRU dos indicadores calculados por (ticker, indicador, parâmetros)
+
+        Cada resultado guarda a versão das séries de origem no cache histórico: se a série
+        do ticker (ou da referência) for recarregada, o resultado é recalculado. Séries fora
+        do cache histórico não têm versão e são sempre recalculadas.
+
+        Args:
+            max_entradas (int): Número máximo de resultados mantidos
+        """
+        self.max_entradas = max_entradas
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave, origens):
+        """Retorna o resultado em cache se foi calculado a partir das mesmas versões das séries de origem"""
+        with self._lock:
+            entrada = self._resultados.get(chave)
+            if entrada is None or None in origens or entrada[0] != origens:
+                self.falhas += 1
+                return None
+            self._resultados.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def armazenar(self, chave, origens, resultado):
+        with self._lock:
+            self._resultados[chave] = (origens, resultado)
+            self._resultados.move_to_end(chave)
+            while len(self._resultados) > self.max_entradas:
+                self._resultados.popitem(last=False)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._resultados),
+                'limite_entradas': self.max_entradas,
+                'acertos': self.acertos,
+                'falhas': self.falhas
+            }
+
+
+# Instância compartilhada por todos os módulos do processo
+cache_indicadores = CacheIndicadores()
+
+
+def calcular_indicadores(ticker, dados, especificacoes, obter_serie=None):
+    """
+    Calcula indicadores sobre a série completa de um ativo, usando o cache de resultados
+
+    Args:
+        ticker (str): O ticker do ativo
+        dados (pandas.DataFrame): Série histórica completa indexada por data (do cache histórico)
+        especificacoes (list): Especificações retornadas por interpretar_indicadores
+        obter_serie (callable): Função ticker -> DataFrame usada pela correlação para
+            carregar a série de referência
+
+    Returns:
+        pandas.DataFrame: Colunas dos indicadores indexadas pelas datas de dados
+
+    Raises:
+        ValueError: Se a série de referência da correlação não estiver disponível
+    """
+    # Os indicadores são calculados apenas sobre as datas com fechamento
+    fechamento = pd.to_numeric(dados['fechamento'], errors='coerce').to_numpy(dtype=float)
+    validos = ~np.isnan(fechamento)
+    fechamento = fechamento[validos]
+    colunas = {}
+
+    for nome, parametros in especificacoes:
+        funcao, _ = INDICADORES[nome]
+        argumentos = dict(parametros)
+        origens = (cache_historico.versao(ticker),)
+
+        if nome == 'atr':
+            argumentos['maxima'] = pd.to_numeric(dados['maxima'], errors='coerce').to_numpy(dtype=float)[validos]
+            argumentos['minima'] = pd.to_numeric(dados['minima'], errors='coerce').to_numpy(dtype=float)[validos]
+        elif nome == 'corr':
+            referencia = obter_serie(argumentos['referencia']) if obter_serie else None
+            if referencia is None or referencia.empty:
+                raise ValueError(f"Série de referência indisponível: {argumentos['referencia']}")
+            origens = (cache_historico.versao(ticker), cache_historico.versao(argumentos['referencia']))
+            # Alinhar a referência às datas do ativo, repetindo o último fechamento conhecido
+            argumentos['referencia'] = pd.to_numeric(referencia['fechamento'], errors='coerce') \
+                .reindex(dados.index, method='ffill').to_numpy(dtype=float)[validos]
+
+        chave = (ticker, nome, parametros)
+        resultado = cache_indicadores.obter(chave, origens)
+        if resultado is None:
+            resultado = funcao(fechamento, **argumentos)
+            cache_indicadores.armazenar(chave, origens, resultado)
+
+        for sufixo, valores in resultado.items():
+            coluna = np.full(len(validos), np.nan)
+            coluna[validos] = valores
+            colunas[nome_coluna(nome, parametros, sufixo)] = coluna
+
+    return pd.DataFrame(colunas, index=dados.index)
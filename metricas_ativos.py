@@ -0,0 +1,143 @@
+from datetime import datetime
+import numpy as np
+from motor_metricas import calcular_metricas, calcular_metricas_matriz
+from dados_mercado import obter_matriz_precos
+
+# Janelas (em anos) pré-calculadas na ingestão e gravadas na tabela 'metricas_ativos'
+JANELAS_PADRAO = (1, 3, 5, 10)
+
+# Indicadores gravados para cada ticker e janela
+INDICADORES = ('retorno_acumulado', 'retorno_anualizado', 'volatilidade', 'max_drawdown', 'sharpe')
+
+def data_inicial_periodo(periodo_anos, referencia=None):
+    """
+    Retorna a data inicial de uma janela de periodo_anos anos até a data de referência
+
+    Args:
+        periodo_anos (int): Tamanho da janela em anos
+        referencia (datetime): Data final da janela (padrão: agora)
+
+    Returns:
+        str: Data inicial no formato 'YYYY-MM-DD'
+    """
+    referencia = referencia or datetime.now()
+    try:
+        inicio = referencia.replace(year=referencia.year - periodo_anos)
+    except ValueError:
+        # 29 de fevereiro em ano não bissexto
+        inicio = referencia.replace(year=referencia.year - periodo_anos, day=28)
+    return inicio.strftime('%Y-%m-%d')
+
+def calcular_metricas_janelas(tickers, datas, matriz, janelas=JANELAS_PADRAO, referencia=None):
+    """
+    Calcula os indicadores de cada ticker em cada janela a partir de uma única matriz de preços
+
+    Args:
+        tickers (list): Tickers das colunas da matriz (o CDI, se presente, define o Sharpe)
+        datas (numpy.ndarray): Datas (datetime64) da matriz
+        matriz (numpy.ndarray): Preços (datas x ativos) cobrindo a maior janela
+        janelas (tuple): Janelas em anos
+        referencia (datetime): Data final das janelas (padrão: agora)
+
+    Returns:
+        dict: Dicionário (ticker, periodo_anos) -> indicadores
+    """
+    resultado = {}
+
+    for periodo_anos in janelas:
+        inicio = np.datetime64(data_inicial_periodo(periodo_anos, referencia))
+        linhas = datas >= inicio
+        datas_janela = datas[linhas]
+        matriz_janela = matriz[linhas]
+
+        # Taxa livre de risco: retorno anualizado do CDI na mesma janela
+        taxa_livre_risco = 0
+        if 'CDI' in tickers:
+            metricas_cdi = calcular_metricas(datas_janela, matriz_janela[:, tickers.index('CDI')])
+            taxa_livre_risco = (metricas_cdi or {}).get('retorno_anualizado') or 0
+
+        for ticker, metricas in zip(tickers, calcular_metricas_matriz(datas_janela, matriz_janela, taxa_livre_risco)):
+            if metricas:
+                resultado[(ticker, periodo_anos)] = metricas
+
+    return resultado
+
+def atualizar_metricas_ativos(supabase, tickers, janelas=JANELAS_PADRAO):
+    """
+    Recalcula os indicadores das janelas padrão e os grava na tabela 'metricas_ativos'
+    com um único upsert (conflito por 'ticker,periodo_anos')
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Tickers a recalcular
+        janelas (tuple): Janelas em anos
+
+    Returns:
+        int: Número de registros gravados
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return 0
+
+    referencia = datetime.now()
+    data_inicial = data_inicial_periodo(max(janelas), referencia)
+
+    # Uma única matriz com todos os tickers e o CDI cobrindo a maior janela
+    datas, colunas, matriz = obter_matriz_precos(supabase, tickers + ['CDI'], data_inicial)
+    if not colunas:
+        return 0
+
+    metricas = calcular_metricas_janelas(colunas, datas, matriz, janelas, referencia)
+
+    atualizado_em = referencia.isoformat()
+    data_referencia = str(datas[-1].astype('datetime64[D]'))
+    registros = [
+        dict(
+            {indicador: valores.get(indicador) for indicador in INDICADORES},
+            ticker=ticker,
+            periodo_anos=periodo_anos,
+            data_referencia=data_referencia,
+            atualizado_em=atualizado_em
+        )
+        for (ticker, periodo_anos), valores in metricas.items()
+        if ticker in tickers
+    ]
+
+    if registros:
+        supabase.table('metricas_ativos').upsert(registros, on_conflict='ticker,periodo_anos').execute()
+
+    return len(registros)
+
+def buscar_metricas_ativos(supabase, tickers, periodo_anos):
+    """
+    Lê os indicadores pré-calculados de vários tickers em uma única consulta
+
+    Args:
+        supabase: Cliente Supabase inicializado
+        tickers (list): Lista de tickers
+        periodo_anos (int): Janela em anos
+
+    Returns:
+        dict: Dicionário ticker -> indicadores; vazio se a janela não for padrão ou a
+            tabela não estiver disponível (o chamador deve calcular os indicadores na hora)
+    """
+    if periodo_anos not in JANELAS_PADRAO or not tickers:
+        return {}
+
+    try:
+        response = supabase.table('metricas_ativos') \
+            .select('*') \
+            .eq('periodo_anos', periodo_anos) \
+            .in_('ticker', list(tickers)) \
+            .execute()
+    except Exception as e:
+        print(f"⚠️ Erro ao ler métricas pré-calculadas: {str(e)}")
+        return {}
+
+    return {
+        registro['ticker']: {
+            indicador: float(registro[indicador]) if registro.get(indicador) is not None else None
+            for indicador in INDICADORES
+        }
+        for registro in (response.data or [])
+    }
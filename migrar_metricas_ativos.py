@@ -0,0 +1,73 @@
+import os
+from supabase import create_client
+from dotenv import load_dotenv
+from universo_ativos import UniversoAtivos
+from metricas_ativos import JANELAS_PADRAO, atualizar_metricas_ativos
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+# Configurações do Supabase
+SUPABASE_URL = os.environ.get('SUPABASE_URL')
+SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+
+# Verificar se as variáveis de ambiente estão definidas
+if not SUPABASE_URL or not SUPABASE_KEY:
+    print("\n⚠️ AVISO: Variáveis de ambiente SUPABASE_URL e/ou SUPABASE_KEY não definidas.")
+    print("Defina estas variáveis no ambiente ou no arquivo .env antes de executar a migração:\n")
+    print('SUPABASE_URL=https://seu-projeto.supabase.co')
+    print('SUPABASE_KEY=sua-chave-api\n')
+    exit(1)
+
+def migrar_metricas_ativos():
+    """
+    Cria a tabela 'metricas_ativos' com os indicadores pré-calculados e faz a carga inicial
+
+    1. Exibe o SQL para criar a tabela, com chave única (ticker, periodo_anos)
+    2. Calcula os indicadores das janelas padrão para todos os ativos do universo
+    """
+    try:
+        # Conectar ao Supabase
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        print("✅ Conexão com Supabase estabelecida.")
+
+        # 1. Criar a tabela (DDL não pode ser executado pelo cliente Supabase)
+        print("\n⚠️ AVISO: Execute a seguinte query SQL no SQL Editor do Supabase:")
+        print("""
+CREATE TABLE IF NOT EXISTS public.metricas_ativos (
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    ticker text NOT NULL,
+    periodo_anos integer NOT NULL,
+    retorno_acumulado numeric NULL,
+    retorno_anualizado numeric NULL,
+    volatilidade numeric NULL,
+    max_drawdown numeric NULL,
+    sharpe numeric NULL,
+    data_referencia date NULL,
+    atualizado_em timestamp NULL,
+    CONSTRAINT metricas_ativos_ticker_periodo_key UNIQUE (ticker, periodo_anos)
+);
+        """)
+        print("Pressione Enter quando a tabela estiver criada, ou 'q' para sair: ", end="")
+        resposta = input()
+
+        if resposta.lower() == 'q':
+            print("Operação cancelada pelo usuário.")
+            return
+
+        # 2. Carga inicial
+        tickers = [ativo['ticker'] for ativo in UniversoAtivos(supabase).ativos()]
+        janelas = ', '.join(str(janela) for janela in JANELAS_PADRAO)
+        print(f"\nCalculando métricas de {len(tickers)} ativos para as janelas de {janelas} anos...")
+
+        registros = atualizar_metricas_ativos(supabase, tickers)
+
+        print(f"\n✅ Migração concluída: {registros} registros gravados em metricas_ativos.")
+        print("As métricas serão recalculadas a cada execução de atualizar_dados.py.")
+
+    except Exception as e:
+        print(f"⚠️ Erro durante a migração: {str(e)}")
+
+if __name__ == "__main__":
+    print("\n🚀 Iniciando migração das métricas pré-calculadas...\n")
+    migrar_metricas_ativos()
@@ -0,0 +1,63 @@
+import os
+from supabase import create_client
+from dotenv import load_dotenv
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+# Configurações do Supabase
+SUPABASE_URL = os.environ.get('SUPABASE_URL')
+SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+
+# Verificar se as variáveis de ambiente estão definidas
+if not SUPABASE_URL or not SUPABASE_KEY:
+    print("\n⚠️ AVISO: Variáveis de ambiente SUPABASE_URL e/ou SUPABASE_KEY não definidas.")
+    print("Defina estas variáveis no ambiente ou no arquivo .env antes de executar a migração:\n")
+    print('SUPABASE_URL=https://seu-projeto.supabase.co')
+    print('SUPABASE_KEY=sua-chave-api\n')
+    exit(1)
+
+def migrar_precos_intraday():
+    """
+    Cria a tabela 'precos_intraday' com as cotações consultadas na API RTD
+
+    1. Exibe o SQL para criar a tabela e o índice (ticker, instante) usado nas consultas
+    2. Verifica se a tabela está acessível
+    """
+    try:
+        # Conectar ao Supabase
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        print("✅ Conexão com Supabase estabelecida.")
+
+        # 1. Criar a tabela (DDL não pode ser executado pelo cliente Supabase)
+        print("\n⚠️ AVISO: Execute a seguinte query SQL no SQL Editor do Supabase:")
+        print("""
+CREATE TABLE IF NOT EXISTS public.precos_intraday (
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    ticker text NOT NULL,
+    instante timestamptz NOT NULL,
+    preco numeric NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS precos_intraday_ticker_instante_idx
+    ON public.precos_intraday (ticker, instante);
+        """)
+        print("Pressione Enter quando a tabela estiver criada, ou 'q' para sair: ", end="")
+        resposta = input()
+
+        if resposta.lower() == 'q':
+            print("Operação cancelada pelo usuário.")
+            return
+
+        # 2. Verificar a tabela
+        supabase.table('precos_intraday').select('id').limit(1).execute()
+
+        print("\n✅ Migração concluída: tabela precos_intraday disponível.")
+        print("As cotações serão gravadas a cada ciclo de atualização de preços via API RTD.")
+
+    except Exception as e:
+        print(f"⚠️ Erro durante a migração: {str(e)}")
+
+if __name__ == "__main__":
+    print("\n🚀 Iniciando migração do histórico intradiário...\n")
+    migrar_precos_intraday()
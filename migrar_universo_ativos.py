@@ -0,0 +1,77 @@
+import os
+from supabase import create_client
+from dotenv import load_dotenv
+from universo_ativos import PADROES_UNIVERSO
+
+# Carregar variáveis do arquivo .env
+load_dotenv()
+
+# Configurações do Supabase
+SUPABASE_URL = os.environ.get('SUPABASE_URL')
+SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+
+# Verificar se as variáveis de ambiente estão definidas
+if not SUPABASE_URL or not SUPABASE_KEY:
+    print("\n⚠️ AVISO: Variáveis de ambiente SUPABASE_URL e/ou SUPABASE_KEY não definidas.")
+    print("Defina estas variáveis no ambiente ou no arquivo .env antes de executar a migração:\n")
+    print('SUPABASE_URL=https://seu-projeto.supabase.co')
+    print('SUPABASE_KEY=sua-chave-api\n')
+    exit(1)
+
+def migrar_universo_ativos():
+    """
+    Adiciona à tabela 'ativos' as colunas do universo de ativos e preenche os ativos existentes
+
+    1. Exibe o SQL para criar as colunas fonte, ticker_rtd, fator_escala, classe e habilitado
+    2. Preenche essas colunas para os ativos originais com os valores de PADROES_UNIVERSO
+    """
+    try:
+        # Conectar ao Supabase
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        print("✅ Conexão com Supabase estabelecida.")
+
+        # 1. Criar as colunas (DDL não pode ser executado pelo cliente Supabase)
+        print("\n⚠️ AVISO: Execute a seguinte query SQL no SQL Editor do Supabase:")
+        print("""
+ALTER TABLE public.ativos
+    ADD COLUMN IF NOT EXISTS fonte text NOT NULL DEFAULT 'yahoo',
+    ADD COLUMN IF NOT EXISTS ticker_rtd text NULL,
+    ADD COLUMN IF NOT EXISTS fator_escala numeric NOT NULL DEFAULT 1,
+    ADD COLUMN IF NOT EXISTS classe text NOT NULL DEFAULT 'etf',
+    ADD COLUMN IF NOT EXISTS habilitado boolean NOT NULL DEFAULT true;
+        """)
+        print("Pressione Enter quando as colunas estiverem criadas, ou 'q' para sair: ", end="")
+        resposta = input()
+
+        if resposta.lower() == 'q':
+            print("Operação cancelada pelo usuário.")
+            return
+
+        # 2. Preencher os ativos originais
+        print("\nPreenchendo colunas do universo para os ativos existentes...")
+
+        atualizados = 0
+        for ticker, padrao in PADROES_UNIVERSO.items():
+            dados = {
+                'fonte': padrao['fonte'],
+                'ticker_rtd': padrao['ticker_rtd'],
+                'fator_escala': padrao['fator_escala'],
+                'classe': padrao['classe']
+            }
+            response = supabase.table('ativos').update(dados).eq('ticker', ticker).execute()
+
+            if response.data:
+                atualizados += 1
+                print(f"  ✅ {ticker}: {dados}")
+            else:
+                print(f"  ⚠️ {ticker} não encontrado na tabela 'ativos'")
+
+        print(f"\n✅ Migração concluída: {atualizados} ativos atualizados.")
+        print("Novos ativos podem ser incluídos diretamente na tabela 'ativos' com as colunas do universo.")
+
+    except Exception as e:
+        print(f"⚠️ Erro durante a migração: {str(e)}")
+
+if __name__ == "__main__":
+    print("\n🚀 Iniciando migração do universo de ativos...\n")
+    migrar_universo_ativos()
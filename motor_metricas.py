@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# Convenções usadas nos cálculos
+DIAS_UTEIS_ANO = 252
+DIAS_ANO_CIVIL = 365.25
+
+def calcular_metricas(datas, precos, taxa_livre_risco=None):
+    """
+    Calcula todos os indicadores de um ativo em uma única passada vetorizada
+    sobre a série de preços já carregada em memória
+
+    Args:
+        datas (numpy.ndarray): Datas (datetime64) em ordem crescente
+        precos (numpy.ndarray): Preços de fechamento alinhados às datas
+        taxa_livre_risco (float): Taxa livre de risco anualizada em percentual
+            (se None, o índice de Sharpe não é calculado)
+
+    Returns:
+        dict: Dicionário com retorno_acumulado, retorno_anualizado, volatilidade,
+            max_drawdown e sharpe, ou None se a série for insuficiente
+    """
+    datas = np.asarray(datas, dtype='datetime64[ns]')
+    precos = np.asarray(precos, dtype=float)
+
+    # Descartar pontos sem preço válido
+    validos = np.isfinite(precos) & (precos > 0)
+    datas = datas[validos]
+    precos = precos[validos]
+
+    if len(precos) == 0:
+        return None
+
+    preco_inicial = precos[0]
+    preco_final = precos[-1]
+
+    # Retornos acumulado e anualizado
+    retorno_acumulado = (preco_final / preco_inicial - 1) * 100
+
+    anos = ((datas[-1] - datas[0]) / np.timedelta64(1, 'D')) / DIAS_ANO_CIVIL
+    retorno_anualizado = ((preco_final / preco_inicial) ** (1 / max(anos, 0.01)) - 1) * 100
+
+    # Volatilidade anualizada (desvio padrão amostral dos retornos diários * raiz de 252)
+    volatilidade = None
+    if len(precos) > 2:
+        retornos_diarios = (precos[1:] / precos[:-1] - 1) * 100
+        volatilidade = float(np.std(retornos_diarios, ddof=1) * np.sqrt(DIAS_UTEIS_ANO))
+
+    # Máximo drawdown a partir do pico acumulado
+    picos = np.maximum.accumulate(precos)
+    max_drawdown = float(np.min(precos / picos - 1) * 100)
+
+    # Índice de Sharpe
+    sharpe = None
+    if taxa_livre_risco is not None and volatilidade:
+        sharpe = round(float((retorno_anualizado - taxa_livre_risco) / volatilidade), 2)
+
+    return {
+        'retorno_acumulado': round(float(retorno_acumulado), 2),
+        'retorno_anualizado': round(float(retorno_anualizado), 2),
+        'volatilidade': round(volatilidade, 2) if volatilidade is not None else None,
+        'max_drawdown': round(max_drawdown, 2),
+        'sharpe': sharpe
+    }
+
+def calcular_metricas_dataframe(dados, taxa_livre_risco=None, coluna='fechamento'):
+    """
+    Calcula os indicadores a partir de um DataFrame de dados históricos indexado por data
+
+    Args:
+        dados (pandas.DataFrame): DataFrame retornado por obter_dados_historicos
+        taxa_livre_risco (float): Taxa livre de risco anualizada em percentual
+        coluna (str): Coluna de preços usada no cálculo (padrão: 'fechamento')
+
+    Returns:
+        dict: Dicionário com os indicadores ou None se não houver dados
+    """
+    if dados is None or dados.empty or coluna not in dados.columns:
+        return None
+
+    precos = pd.to_numeric(dados[coluna], errors='coerce').to_numpy(dtype=float)
+    return calcular_metricas(dados.index.values, precos, taxa_livre_risco)
+
+def calcular_metricas_matriz(datas, matriz, taxa_livre_risco=None):
+    """
+    Calcula os indicadores de cada coluna de uma matriz data x ativo
+
+    Args:
+        datas (numpy.ndarray): Datas (datetime64) em ordem crescente
+        matriz (numpy.ndarray): Preços (datas x ativos), com NaN onde o ativo não tem registro
+        taxa_livre_risco (float): Taxa livre de risco anualizada em percentual
+
+    Returns:
+        list: Lista com o dicionário de indicadores (ou None) de cada coluna
+    """
+    return [calcular_metricas(datas, matriz[:, j], taxa_livre_risco) for j in range(matriz.shape[1])]
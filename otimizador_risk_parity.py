@@ -0,0 +1,181 @@
+import time
+import numpy as np
+from dados_mercado import preencher_adiante
+
+# Convenções usadas na anualização
+DIAS_UTEIS_ANO = 252
+
+def extrair_pesos_cesta(ativos):
+    """
+    Normaliza o campo 'ativos' de uma cesta para um dicionário ticker -> peso
+
+    Args:
+        ativos (dict | list): Objeto JSON da cesta, no formato {ticker: peso} ou
+            [{'ticker': ..., 'peso': ...}]
+
+    Returns:
+        dict: Dicionário ticker -> peso (float)
+    """
+    if isinstance(ativos, dict):
+        itens = ativos.items()
+    elif isinstance(ativos, list):
+        itens = [(item.get('ticker'), item.get('peso', 0)) for item in ativos if isinstance(item, dict)]
+    else:
+        return {}
+
+    pesos = {}
+    for ticker, peso in itens:
+        if not ticker:
+            continue
+        try:
+            pesos[ticker] = float(peso)
+        except (TypeError, ValueError):
+            pesos[ticker] = 0.0
+    return pesos
+
+def calcular_matriz_covariancia(matriz_precos):
+    """
+    Calcula a matriz de covariância anualizada dos retornos diários
+
+    Args:
+        matriz_precos (numpy.ndarray): Preços (datas x ativos), com NaN onde o ativo não tem registro
+
+    Returns:
+        tuple: (covariancia, observacoes) com a matriz ativos x ativos e o número de retornos usados
+    """
+    # Alinhar calendários diferentes repetindo o último preço e descartar o período
+    # anterior ao início do ativo mais recente
+    precos = preencher_adiante(matriz_precos)
+    precos = precos[~np.isnan(precos).any(axis=1)]
+
+    if len(precos) < 3:
+        raise ValueError("Histórico comum insuficiente para estimar a covariância")
+
+    retornos = precos[1:] / precos[:-1] - 1
+    covariancia = np.cov(retornos, rowvar=False, ddof=1) * DIAS_UTEIS_ANO
+
+    return np.atleast_2d(covariancia), len(retornos)
+
+def resolver_risk_parity(covariancia, orcamento_risco=None, tolerancia=1e-10, max_iteracoes=100):
+    """
+    Resolve os pesos de contribuição de risco igual (ERC) pelo método de Newton
+
+    Minimiza f(y) = 0.5 * y'Σy - Σ b_i ln(y_i), cujo ótimo satisfaz y_i (Σy)_i = b_i,
+    e normaliza os pesos para somarem 1. A barreira logarítmica mantém todos os
+    pesos positivos (carteira apenas comprada).
+
+    Args:
+        covariancia (numpy.ndarray): Matriz de covariância (ativos x ativos)
+        orcamento_risco (numpy.ndarray): Fração do risco alocada a cada ativo (padrão: igual)
+        tolerancia (float): Critério de parada sobre o gradiente
+        max_iteracoes (int): Número máximo de iterações de Newton
+
+    Returns:
+        tuple: (pesos, iteracoes) com os pesos normalizados e o número de iterações usadas
+    """
+    n = covariancia.shape[0]
+    if orcamento_risco is None:
+        orcamento = np.full(n, 1.0 / n)
+    else:
+        orcamento = np.asarray(orcamento_risco, dtype=float)
+        orcamento = orcamento / orcamento.sum()
+
+    volatilidades = np.sqrt(np.diag(covariancia))
+    if np.any(volatilidades <= 0):
+        raise ValueError("Ativo com volatilidade nula não pode compor uma carteira de risk parity")
+
+    # Ponto inicial: pesos inversamente proporcionais à volatilidade
+    y = orcamento / volatilidades
+    y = y / np.sqrt(y @ covariancia @ y)
+
+    def objetivo(v):
+        return 0.5 * v @ covariancia @ v - orcamento @ np.log(v)
+
+    iteracao = 0
+    for iteracao in range(1, max_iteracoes + 1):
+        sigma_y = covariancia @ y
+        gradiente = sigma_y - orcamento / y
+        if np.max(np.abs(gradiente)) < tolerancia:
+            break
+
+        hessiana = covariancia + np.diag(orcamento / y ** 2)
+        direcao = -np.linalg.solve(hessiana, gradiente)
+
+        # Passo máximo que mantém todos os pesos positivos
+        negativos = direcao < 0
+        passo = 1.0
+        if np.any(negativos):
+            passo = min(1.0, 0.95 * np.min(-y[negativos] / direcao[negativos]))
+
+        # Busca linear com backtracking (condição de Armijo)
+        valor_atual = objetivo(y)
+        declive = gradiente @ direcao
+        while passo > 1e-12 and objetivo(y + passo * direcao) > valor_atual + 1e-4 * passo * declive:
+            passo *= 0.5
+
+        y = y + passo * direcao
+
+    return y / y.sum(), iteracao
+
+def calcular_contribuicoes_risco(pesos, covariancia):
+    """
+    Calcula a volatilidade da carteira e a contribuição percentual de cada ativo para o risco
+
+    Returns:
+        tuple: (volatilidade, contribuicoes) com a volatilidade anualizada e a fração do risco por ativo
+    """
+    variancia = pesos @ covariancia @ pesos
+    if variancia <= 0:
+        return 0.0, np.zeros_like(pesos)
+    contribuicoes = pesos * (covariancia @ pesos) / variancia
+    return float(np.sqrt(variancia)), contribuicoes
+
+def otimizar_carteira(tickers, matriz_precos, alavancagem=1.0, volatilidade_alvo=None,
+                      alavancagem_maxima=None, orcamento_risco=None):
+    """
+    Calcula os pesos de risk parity para um conjunto de ativos a partir de seus preços
+
+    Args:
+        tickers (list): Tickers das colunas de matriz_precos
+        matriz_precos (numpy.ndarray): Preços (datas x ativos)
+        alavancagem (float): Soma dos pesos da carteira (1 = sem alavancagem)
+        volatilidade_alvo (float): Volatilidade anualizada alvo em percentual; se informada,
+            a alavancagem é ajustada para atingi-la
+        alavancagem_maxima (float): Limite superior para a alavancagem resultante
+        orcamento_risco (dict): Fração do risco por ticker (padrão: igual para todos)
+
+    Returns:
+        dict: Pesos, contribuições de risco e estatísticas da otimização
+    """
+    inicio = time.perf_counter()
+
+    covariancia, observacoes = calcular_matriz_covariancia(matriz_precos)
+
+    orcamento = None
+    if orcamento_risco:
+        orcamento = np.array([float(orcamento_risco.get(ticker, 0)) for ticker in tickers])
+        if np.any(orcamento <= 0):
+            raise ValueError("O orçamento de risco deve ser positivo para todos os ativos")
+
+    pesos, iteracoes = resolver_risk_parity(covariancia, orcamento)
+    volatilidade, contribuicoes = calcular_contribuicoes_risco(pesos, covariancia)
+
+    # Restrições de alavancagem
+    if volatilidade_alvo is not None and volatilidade > 0:
+        alavancagem = (volatilidade_alvo / 100) / volatilidade
+    if alavancagem_maxima is not None:
+        alavancagem = min(alavancagem, alavancagem_maxima)
+    if alavancagem <= 0:
+        raise ValueError("A alavancagem deve ser positiva")
+
+    pesos_finais = pesos * alavancagem
+
+    return {
+        'pesos': {ticker: round(float(peso), 6) for ticker, peso in zip(tickers, pesos_finais)},
+        'contribuicao_risco': {ticker: round(float(c) * 100, 4) for ticker, c in zip(tickers, contribuicoes)},
+        'volatilidade_carteira': round(volatilidade * alavancagem * 100, 4),
+        'alavancagem': round(float(alavancagem), 6),
+        'observacoes': observacoes,
+        'iteracoes': iteracoes,
+        'tempo_ms': round((time.perf_counter() - inicio) * 1000, 3)
+    }
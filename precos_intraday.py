@@ -0,0 +1,285 @@
+import os
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+from calendario_b3 import FUSO_B3, agora_b3
+from dados_mercado import TAMANHO_PAGINA
+
+# Resoluções das barras OHLC, em segundos
+RESOLUCOES = {'1m': 60, '5m': 300, '15m': 900}
+
+# Dias de barras mantidos em memória por ticker (dias anteriores são lidos da tabela a cada consulta)
+INTRADAY_DIAS_MEMORIA = int(os.environ.get('INTRADAY_DIAS_MEMORIA', 5))
+# Máximo de ticks aguardando gravação (os mais antigos são descartados se o banco ficar indisponível)
+INTRADAY_MAX_PENDENTES = int(os.environ.get('INTRADAY_MAX_PENDENTES', 50000))
+
+
+class _DiaIntraday:
+    """Barras de um ticker em um dia, em todas as resoluções"""
+
+    def __init__(self):
+        # resolução -> início da barra (segundos desde a época) -> barra
+        self.barras = {resolucao: {} for resolucao in RESOLUCOES}
+        # Maior id da tabela já lido na sincronização
+        self.ultimo_id = 0
+        # ids gravados por este processo ainda não alcançados pela sincronização (já agregados)
+        self.proprios = set()
+
+    def agregar(self, instante, preco):
+        """Incorpora um tick a cada resolução em O(1), em qualquer ordem de chegada"""
+        segundos = instante.timestamp()
+        for resolucao, largura in RESOLUCOES.items():
+            inicio = int(segundos // largura) * largura
+            barra = self.barras[resolucao].get(inicio)
+            if barra is None:
+                self.barras[resolucao][inicio] = {
+                    'abertura': preco, 'maxima': preco, 'minima': preco, 'fechamento': preco,
+                    'ticks': 1, '_aberta_em': segundos, '_fechada_em': segundos
+                }
+                continue
+
+            barra['maxima'] = max(barra['maxima'], preco)
+            barra['minima'] = min(barra['minima'], preco)
+            barra['ticks'] += 1
+            if segundos < barra['_aberta_em']:
+                barra['abertura'], barra['_aberta_em'] = preco, segundos
+            if segundos >= barra['_fechada_em']:
+                barra['fechamento'], barra['_fechada_em'] = preco, segundos
+
+
+class PrecosIntraday:
+    def __init__(self, supabase, dias_memoria=INTRADAY_DIAS_MEMORIA, max_pendentes=INTRADAY_MAX_PENDENTES):
+        """
+        Histórico intradiário das cotações da API RTD
+
+        Cada cotação consultada é acumulada para gravação em lote na tabela 'precos_intraday'
+        e agregada na hora às barras OHLC de 1, 5 e 15 minutos mantidas em memória. Ticks
+        gravados por outros processos são incorporados a partir da tabela, lendo apenas os
+        registros com id acima do último já lido; os gravados por este processo são pulados.
+        Nenhum lock é mantido durante o acesso à tabela.
+
+        Só ficam em memória os últimos 'dias_memoria' dias dos tickers com cotações registradas
+        neste processo; consultas de outros dias ou tickers montam as barras a partir de uma
+        leitura avulsa da tabela, sem guardá-las.
+
+        Args:
+            supabase: Cliente Supabase inicializado
+            dias_memoria (int): Dias de barras mantidos em memória por ticker
+            max_pendentes (int): Máximo de ticks aguardando gravação
+        """
+        self.supabase = supabase
+        self.dias_memoria = dias_memoria
+        self.max_pendentes = max_pendentes
+        self._dias = {}
+        # Tickers com cotações registradas neste processo (os únicos com barras em memória)
+        self._tickers = set()
+        self._pendentes = []
+        self._lock = threading.Lock()
+        # (ticker, instante, preco) dos ticks em um insert ainda sem resposta: a sincronização
+        # os reconhece como próprios antes de o insert informar seus ids
+        self._em_gravacao = Counter()
+
+        # Estatísticas
+        self.registrados = 0
+        self.gravados = 0
+        self.descartados = 0
+
+    def _limite(self):
+        """Último dia fora da janela mantida em memória"""
+        return agora_b3().date() - timedelta(days=self.dias_memoria)
+
+    def _em_memoria(self, ticker, dia):
+        """Se as barras do ticker no dia são mantidas em memória (chamado com o lock adquirido)"""
+        hoje = agora_b3().date()
+        return ticker in self._tickers and hoje - timedelta(days=self.dias_memoria) < dia <= hoje
+
+    def _dia(self, ticker, dia):
+        """Estado do ticker no dia, criado sob demanda (chamado com o lock adquirido)"""
+        chave = (ticker, dia)
+        estado = self._dias.get(chave)
+        if estado is None:
+            estado = self._dias[chave] = _DiaIntraday()
+            limite = self._limite()
+            for antiga in [c for c in self._dias if c[1] <= limite and c != chave]:
+                del self._dias[antiga]
+        return estado
+
+    @staticmethod
+    def _chave(ticker, instante, preco):
+        """Identifica um tick pelo conteúdo, igual na fila de gravação e na leitura da tabela"""
+        return ticker, datetime.fromisoformat(instante), float(preco)
+
+    def registrar(self, ticker, preco, instante=None):
+        """
+        Registra uma cotação: agrega às barras e a acumula para a próxima gravação
+
+        Args:
+            ticker (str): Ticker do ativo no banco
+            preco (float): Preço já ajustado pelo fator de escala
+            instante (datetime): Instante da cotação com fuso horário (padrão: agora)
+        """
+        instante = (instante or agora_b3()).astimezone(FUSO_B3)
+        with self._lock:
+            self._tickers.add(ticker)
+            self._dia(ticker, instante.date()).agregar(instante, preco)
+            self._pendentes.append({'ticker': ticker, 'instante': instante.isoformat(), 'preco': preco})
+            self.registrados += 1
+
+            excedentes = len(self._pendentes) - self.max_pendentes
+            if excedentes > 0:
+                del self._pendentes[:excedentes]
+                self.descartados += excedentes
+
+    def gravar(self):
+        """
+        Grava os ticks pendentes com um único insert
+
+        Returns:
+            int: Número de ticks gravados
+
+        Raises:
+            Exception: Se o insert falhar; os ticks voltam para a fila
+        """
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, []
+            chaves = Counter(self._chave(tick['ticker'], tick['instante'], tick['preco']) for tick in pendentes)
+            self._em_gravacao.update(chaves)
+
+        if not pendentes:
+            return 0
+
+        try:
+            inseridos = self.supabase.table('precos_intraday').insert(pendentes).execute().data or []
+        except Exception:
+            with self._lock:
+                self._em_gravacao -= chaves
+                self._pendentes = pendentes + self._pendentes
+            raise
+
+        with self._lock:
+            self._em_gravacao -= chaves
+            self.gravados += len(pendentes)
+            for registro in inseridos:
+                dia = datetime.fromisoformat(registro['instante']).astimezone(FUSO_B3).date()
+                estado = self._dias.get((registro['ticker'], dia))
+                # Com id já alcançado, a sincronização o reconheceu pelo conteúdo e o pulou
+                if estado is not None and registro['id'] > estado.ultimo_id:
+                    estado.proprios.add(registro['id'])
+        return len(pendentes)
+
+    def _ler_ticks(self, ticker, dia, ultimo_id):
+        """Lê os ticks do ticker no dia com id acima de ultimo_id, com paginação por id"""
+        inicio_dia = datetime.combine(dia, time.min, tzinfo=FUSO_B3)
+        fim_dia = inicio_dia + timedelta(days=1)
+
+        registros = []
+        while True:
+            pagina = self.supabase.table('precos_intraday') \
+                .select('id,instante,preco') \
+                .eq('ticker', ticker) \
+                .gte('instante', inicio_dia.isoformat()) \
+                .lt('instante', fim_dia.isoformat()) \
+                .gt('id', ultimo_id) \
+                .order('id', desc=False) \
+                .limit(TAMANHO_PAGINA) \
+                .execute().data or []
+            registros.extend(pagina)
+            if len(pagina) < TAMANHO_PAGINA:
+                return registros
+            ultimo_id = pagina[-1]['id']
+
+    def sincronizar(self, ticker, dia):
+        """
+        Incorpora às barras do ticker no dia os ticks da tabela ainda não lidos
+
+        Lê apenas os registros com id acima do último já lido; os gravados por este
+        processo (agregados ao serem registrados) são pulados, seja pelo id informado
+        pelo insert, seja pelo conteúdo enquanto o insert ainda não respondeu.
+        """
+        if not self.supabase:
+            return
+
+        with self._lock:
+            if not self._em_memoria(ticker, dia):
+                return
+            estado = self._dia(ticker, dia)
+            ultimo_id = estado.ultimo_id
+
+        ticks = self._ler_ticks(ticker, dia, ultimo_id)
+
+        with self._lock:
+            for tick in ticks:
+                # Já incorporado por uma sincronização concorrente
+                if tick['id'] <= estado.ultimo_id:
+                    continue
+                estado.ultimo_id = tick['id']
+
+                if tick['id'] in estado.proprios:
+                    estado.proprios.discard(tick['id'])
+                    continue
+                chave = self._chave(ticker, tick['instante'], tick['preco'])
+                if chave not in self._em_gravacao:
+                    estado.agregar(chave[1].astimezone(FUSO_B3), chave[2])
+
+    def barras(self, ticker, dia=None, resolucao='1m', sincronizar=True):
+        """
+        Retorna as barras OHLC de um ticker em um dia
+
+        Args:
+            ticker (str): Ticker do ativo no banco
+            dia (date): Dia do pregão (padrão: hoje, no fuso da B3)
+            resolucao (str): '1m', '5m' ou '15m'
+            sincronizar (bool): Se True, completa antes as barras com os ticks da tabela
+
+        Returns:
+            list: Barras (inicio, abertura, maxima, minima, fechamento, ticks) em ordem cronológica
+
+        Raises:
+            ValueError: Se a resolução não for suportada
+        """
+        if resolucao not in RESOLUCOES:
+            raise ValueError(f"Resolução inválida. Use {', '.join(RESOLUCOES)}")
+
+        dia = dia or agora_b3().date()
+        with self._lock:
+            em_memoria = self._em_memoria(ticker, dia)
+
+        if not em_memoria:
+            # Dia fora da janela ou ticker não acompanhado: leitura avulsa, sem guardar o estado
+            estado = _DiaIntraday()
+            if self.supabase:
+                for tick in self._ler_ticks(ticker, dia, 0):
+                    _, instante, preco = self._chave(ticker, tick['instante'], tick['preco'])
+                    estado.agregar(instante.astimezone(FUSO_B3), preco)
+            return self._formatar(estado.barras[resolucao])
+
+        if sincronizar:
+            self.sincronizar(ticker, dia)
+
+        with self._lock:
+            return self._formatar(self._dia(ticker, dia).barras[resolucao])
+
+    @staticmethod
+    def _formatar(barras):
+        """Barras de uma resolução em ordem cronológica, sem os campos internos"""
+        return [
+            {
+                'inicio': datetime.fromtimestamp(inicio, FUSO_B3).isoformat(),
+                'abertura': barra['abertura'],
+                'maxima': barra['maxima'],
+                'minima': barra['minima'],
+                'fechamento': barra['fechamento'],
+                'ticks': barra['ticks']
+            }
+            for inicio, barra in sorted(barras.items())
+        ]
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'registrados': self.registrados,
+                'gravados': self.gravados,
+                'descartados': self.descartados,
+                'pendentes': len(self._pendentes),
+                'dias_em_memoria': len(self._dias)
+            }
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+# Variação relativa mínima para gravar um novo preço (0 = grava qualquer mudança)
+PRECO_TOLERANCIA = float(os.environ.get('PRECO_TOLERANCIA', 0))
+# Intervalo (em segundos) para regravar um preço inalterado, sinalizando que a cotação segue ativa
+PRECO_HEARTBEAT_SEGUNDOS = float(os.environ.get('PRECO_HEARTBEAT_SEGUNDOS', 900))
+
+
+class PublicadorPrecos:
+    def __init__(self, supabase, tolerancia=PRECO_TOLERANCIA, heartbeat_segundos=PRECO_HEARTBEAT_SEGUNDOS):
+        """
+        Acumula as cotações de um ciclo de atualização e as grava na tabela 'ativos'
+        com um único upsert em lote (conflito por 'ticker')
+
+        Cotações iguais à última gravada (ou com variação relativa até a tolerância) não
+        são regravadas, exceto a cada heartbeat_segundos.
+
+        Args:
+            supabase: Cliente Supabase inicializado
+            tolerancia (float): Variação relativa abaixo da qual o preço é considerado inalterado
+            heartbeat_segundos (float): Intervalo máximo sem gravar um ativo (None = sem heartbeat)
+        """
+        self.supabase = supabase
+        self.tolerancia = tolerancia
+        self.heartbeat_segundos = heartbeat_segundos
+        self._pendentes = {}
+        self._publicado_em = {}
+        self._lock = threading.Lock()
+
+        # Último preço gravado de cada ativo: ticker -> {'nome', 'preco_atual', 'data_atualizacao'}
+        self.estado = {}
+
+        # Estatísticas
+        self.gravados = 0
+        self.suprimidos = 0
+
+    def _alterado(self, ticker, preco):
+        """Verifica se o preço difere do último gravado além da tolerância ou se o heartbeat venceu"""
+        anterior = self.estado.get(ticker)
+        if anterior is None or anterior['preco_atual'] is None:
+            return True
+
+        if self.heartbeat_segundos is not None and \
+                time.monotonic() - self._publicado_em.get(ticker, 0) >= self.heartbeat_segundos:
+            return True
+
+        ultimo = anterior['preco_atual']
+        if preco == ultimo:
+            return False
+        if not ultimo:
+            return True
+        return abs(preco - ultimo) / abs(ultimo) > self.tolerancia
+
+    def registrar(self, ticker, nome, preco, data_atualizacao=None):
+        """
+        Registra a cotação de um ativo para a próxima gravação (a última cotação de cada ticker prevalece)
+
+        Args:
+            ticker (str): Ticker do ativo no banco
+            nome (str): Nome do ativo (obrigatório no upsert, pois a coluna é NOT NULL)
+            preco (float): Preço já ajustado pelo fator de escala
+            data_atualizacao (str): Data da cotação em ISO 8601 (padrão: agora)
+
+        Returns:
+            bool: True se a cotação será gravada, False se foi suprimida por não ter mudado
+        """
+        with self._lock:
+            if not self._alterado(ticker, preco):
+                self._pendentes.pop(ticker, None)
+                self.suprimidos += 1
+                return False
+
+            self._pendentes[ticker] = {
+                'ticker': ticker,
+                'nome': nome,
+                'preco_atual': preco,
+                'data_atualizacao': data_atualizacao or datetime.now().isoformat()
+            }
+            return True
+
+    def pendentes(self):
+        """Número de cotações aguardando gravação"""
+        with self._lock:
+            return len(self._pendentes)
+
+    def publicar(self):
+        """
+        Grava todas as cotações pendentes com um único upsert
+
+        Returns:
+            list: Registros gravados (ticker, nome, preco_atual, data_atualizacao)
+
+        Raises:
+            Exception: Se o upsert falhar; as cotações voltam para a fila do próximo ciclo
+        """
+        with self._lock:
+            registros = list(self._pendentes.values())
+            self._pendentes = {}
+
+        if not registros:
+            return []
+
+        try:
+            self.supabase.table('ativos').upsert(registros, on_conflict='ticker').execute()
+        except Exception:
+            # Devolver à fila apenas as cotações que não foram substituídas por outras mais recentes
+            with self._lock:
+                for registro in registros:
+                    self._pendentes.setdefault(registro['ticker'], registro)
+            raise
+
+        agora = time.monotonic()
+        with self._lock:
+            self.gravados += len(registros)
+            for registro in registros:
+                self._publicado_em[registro['ticker']] = agora
+                self.estado[registro['ticker']] = {
+                    'nome': registro['nome'],
+                    'preco_atual': registro['preco_atual'],
+                    'data_atualizacao': registro['data_atualizacao']
+                }
+
+        return registros
+
+    def estatisticas(self):
+        """Retorna os contadores de gravações e de cotações suprimidas"""
+        with self._lock:
+            return {
+                'gravados': self.gravados,
+                'suprimidos': self.suprimidos,
+                'pendentes': len(self._pendentes),
+                'tolerancia': self.tolerancia,
+                'heartbeat_segundos': self.heartbeat_segundos
+            }
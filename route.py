@@ -5,7 +5,8 @@ from calculos_financeiros import (
     calcular_volatilidade,
     calcular_max_drawdown,
     calcular_sharpe,
-    obter_resumo_ativo
+    obter_resumo_ativo,
+    obter_resumo_varios
 )
 
 app = Flask(__name__)
@@ -118,12 +119,7 @@ def api_resumo_varios():
     tickers = tickers_param.split(',')
     periodo_anos = request.args.get('periodo', default=5, type=int)
     
-    resultados = {}
-    for ticker in tickers:
-        ticker = ticker.strip()
-        resultado = obter_resumo_ativo(ticker, periodo_anos)
-        if resultado is not None:
-            resultados[ticker] = resultado
+    resultados = obter_resumo_varios(tickers, periodo_anos)
     
     if not resultados:
         return jsonify({'error': 'Não foi possível obter dados para nenhum dos tickers fornecidos'}), 404
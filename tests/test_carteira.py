@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from carteira import calcular_desempenho
+
+
+def _serie_linear(inicio, fim, valor_inicial, valor_final):
+    datas = pd.date_range(inicio, fim)
+    return pd.DataFrame({'fechamento': np.linspace(valor_inicial, valor_final, len(datas))}, index=datas)
+
+
+def test_twr_inclui_retorno_do_primeiro_dia():
+    # Compra abaixo do fechamento: o ganho do preço pago até o fechamento do dia conta no TWR
+    serie = _serie_linear('2024-01-01', '2024-12-31', 10, 20)
+    transacoes = [('X', 'buy', 10, 8, '2024-01-02'), ('X', 'sell', 10, 12, '2024-02-01')]
+
+    resultado = calcular_desempenho(transacoes, {'X': serie})
+
+    assert resultado['curva'][0]['retorno_acumulado'] > 0
+    assert resultado['retornos']['twr'] == resultado['curva'][-1]['retorno_acumulado'] == 50.0
+    assert resultado['retornos']['mwr'] == 50.0
+
+
+def test_drawdown_conta_perda_do_primeiro_dia():
+    # Compra acima do fechamento: o primeiro dia já é uma perda em relação à base
+    serie = _serie_linear('2024-01-01', '2024-01-31', 10, 10)
+    transacoes = [('X', 'buy', 10, 12.5, '2024-01-02')]
+
+    resultado = calcular_desempenho(transacoes, {'X': serie})
+
+    assert resultado['curva'][0]['drawdown'] == -20.0
+    assert resultado['retornos']['max_drawdown'] == -20.0
+    assert resultado['retornos']['twr'] == -20.0
@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+# Intervalo (em segundos) entre comentários de keep-alive enviados a clientes sem atualizações
+SSE_KEEPALIVE_SEGUNDOS = float(os.environ.get('SSE_KEEPALIVE_SEGUNDOS', 15))
+# Espera (em milissegundos) informada aos clientes para reconectar após uma queda
+SSE_RECONEXAO_MS = int(os.environ.get('SSE_RECONEXAO_MS', 3000))
+# Número máximo de conexões de streaming simultâneas
+SSE_MAX_ASSINANTES = int(os.environ.get('SSE_MAX_ASSINANTES', 500))
+
+
+class LimiteAssinantes(Exception):
+    """Número máximo de assinantes atingido"""
+
+
+class Assinatura:
+    def __init__(self, tickers=None):
+        """
+        Fila de um cliente de streaming: guarda apenas a última cotação de cada ticker
+        ainda não entregue (atualizações do mesmo ticker são agrupadas)
+
+        Args:
+            tickers (set): Tickers assinados (None = todos)
+        """
+        self.tickers = tickers
+        self._pendentes = {}
+        self._condicao = threading.Condition()
+        self.encerrada = False
+
+        # Estatísticas
+        self.agrupadas = 0
+
+    def interessa(self, ticker):
+        return self.tickers is None or ticker in self.tickers
+
+    def enfileirar(self, atualizacoes):
+        """Enfileira as atualizações de interesse, substituindo as ainda não entregues do mesmo ticker"""
+        with self._condicao:
+            novas = False
+            for ticker, atualizacao in atualizacoes.items():
+                if not self.interessa(ticker):
+                    continue
+                if ticker in self._pendentes:
+                    self.agrupadas += 1
+                self._pendentes[ticker] = atualizacao
+                novas = True
+            if novas:
+                self._condicao.notify()
+
+    def aguardar(self, timeout=None):
+        """
+        Bloqueia até haver atualizações, a assinatura ser encerrada ou o timeout vencer
+
+        Returns:
+            list: Atualizações pendentes (vazia se nada chegou no período)
+        """
+        with self._condicao:
+            if not self._pendentes and not self.encerrada:
+                self._condicao.wait(timeout)
+            pendentes, self._pendentes = self._pendentes, {}
+        return list(pendentes.values())
+
+    def encerrar(self):
+        with self._condicao:
+            self.encerrada = True
+            self._condicao.notify()
+
+
+class TransmissorPrecos:
+    def __init__(self, max_assinantes=SSE_MAX_ASSINANTES):
+        """
+        Distribui em memória as cotações dos ciclos de atualização de preços aos clientes
+        de streaming, sem consultas ao banco
+
+        Args:
+            max_assinantes (int): Número máximo de assinaturas simultâneas
+        """
+        self.max_assinantes = max_assinantes
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+
+        # Última cotação transmitida de cada ativo, enviada como estado inicial a novos assinantes
+        self.ultimos = {}
+
+        # Estatísticas
+        self.transmitidas = 0
+        self._agrupadas_encerradas = 0
+
+    def assinar(self, tickers=None):
+        """
+        Cria uma assinatura
+
+        Args:
+            tickers (iterable): Tickers de interesse (None ou vazio = todos)
+
+        Returns:
+            tuple: (assinatura, estado inicial com as últimas cotações dos tickers assinados)
+
+        Raises:
+            LimiteAssinantes: Se o número máximo de assinaturas foi atingido
+        """
+        assinatura = Assinatura(set(tickers) if tickers else None)
+        with self._lock:
+            if len(self._assinaturas) >= self.max_assinantes:
+                raise LimiteAssinantes(f"Limite de {self.max_assinantes} conexões atingido")
+            self._assinaturas.add(assinatura)
+            estado = [atualizacao for ticker, atualizacao in self.ultimos.items() if assinatura.interessa(ticker)]
+        return assinatura, estado
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            if assinatura in self._assinaturas:
+                self._assinaturas.discard(assinatura)
+                self._agrupadas_encerradas += assinatura.agrupadas
+        assinatura.encerrar()
+
+    def transmitir(self, cotacoes):
+        """
+        Envia as cotações de um ciclo aos assinantes interessados
+
+        Args:
+            cotacoes (list): Registros com ticker, nome, preco_atual e data_atualizacao
+
+        Returns:
+            int: Número de assinaturas notificadas
+        """
+        atualizacoes = {
+            cotacao['ticker']: {
+                'ticker': cotacao['ticker'],
+                'nome': cotacao.get('nome'),
+                'preco_atual': cotacao['preco_atual'],
+                'data_atualizacao': cotacao.get('data_atualizacao') or datetime.now().isoformat()
+            }
+            for cotacao in cotacoes
+        }
+        if not atualizacoes:
+            return 0
+
+        with self._lock:
+            self.ultimos.update(atualizacoes)
+            self.transmitidas += len(atualizacoes)
+            assinaturas = list(self._assinaturas)
+
+        for assinatura in assinaturas:
+            assinatura.enfileirar(atualizacoes)
+        return len(assinaturas)
+
+    def eventos(self, assinatura, estado, keepalive_segundos=SSE_KEEPALIVE_SEGUNDOS):
+        """
+        Gera o stream Server-Sent Events de uma assinatura: um evento 'snapshot' com o estado
+        inicial, eventos 'precos' a cada lote de atualizações e comentários de keep-alive
+
+        A assinatura é cancelada quando o cliente desconecta (o gerador é fechado).
+        """
+        try:
+            yield f"retry: {SSE_RECONEXAO_MS}\n"
+            yield f"event: snapshot\ndata: {json.dumps(estado)}\n\n"
+            while not assinatura.encerrada:
+                atualizacoes = assinatura.aguardar(keepalive_segundos)
+                if atualizacoes:
+                    yield f"event: precos\ndata: {json.dumps(atualizacoes)}\n\n"
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.cancelar(assinatura)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'assinantes': len(self._assinaturas),
+                'max_assinantes': self.max_assinantes,
+                'transmitidas': self.transmitidas,
+                'agrupadas': self._agrupadas_encerradas + sum(assinatura.agrupadas for assinatura in self._assinaturas),
+                'ativos_conhecidos': len(self.ultimos)
+            }
+
+
+# Instância compartilhada pelos ciclos de atualização e pelas rotas da API
+transmissor_precos = TransmissorPrecos()
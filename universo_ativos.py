@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+import zlib
+
+# Tempo (em segundos) que o universo de ativos fica em cache antes de ser relido do banco
+UNIVERSO_TTL = int(os.environ.get('UNIVERSO_TTL', 900))
+
+# Valores padrão dos ativos originais, usados enquanto as colunas do universo não existirem
+# na tabela 'ativos' (ver migrar_universo_ativos.py) e para a carga inicial com a tabela vazia
+PADROES_UNIVERSO = {
+    'BOVA11.SA': {'nome': 'BOVA11 (Ibovespa)', 'fonte': 'yahoo', 'ticker_rtd': 'BOVA11', 'fator_escala': 1.0, 'classe': 'etf'},
+    'XFIX11.SA': {'nome': 'XFIX11 (IFIX)', 'fonte': 'yahoo', 'ticker_rtd': 'XFIX11', 'fator_escala': 1.0, 'classe': 'etf'},
+    'IB5M11.SA': {'nome': 'IB5M11 (IMAB5+)', 'fonte': 'yahoo', 'ticker_rtd': 'IB5M11', 'fator_escala': 1.0, 'classe': 'etf'},
+    'B5P211.SA': {'nome': 'B5P211 (IMAB5)', 'fonte': 'yahoo', 'ticker_rtd': 'B5P211', 'fator_escala': 1.0, 'classe': 'etf'},
+    'FIXA11.SA': {'nome': 'FIXA11 (Pré)', 'fonte': 'yahoo', 'ticker_rtd': 'FIXA11', 'fator_escala': 1.0, 'classe': 'etf'},
+    # O mini dólar (WDOFUT) é cotado em pontos por US$ 1.000
+    'USDBRL=X': {'nome': 'USD/BRL (Dólar)', 'fonte': 'yahoo', 'ticker_rtd': 'WDOFUT', 'fator_escala': 0.001, 'classe': 'cambio'},
+    'CDI': {'nome': 'CDI', 'fonte': 'bcb', 'ticker_rtd': None, 'fator_escala': 1.0, 'classe': 'indice'}
+}
+
+def ticker_rtd_padrao(ticker):
+    """Regra geral de conversão do ticker do banco para o ticker da API RTD (remove sufixos)"""
+    return ticker.split('.')[0].replace('=', '')
+
+def pertence_ao_shard(ticker, shard=None, total_shards=None):
+    """
+    Verifica se um ticker pertence a um shard (partição estável por hash do ticker)
+
+    Args:
+        ticker (str): O ticker do ativo
+        shard (int): Índice do shard (0 a total_shards - 1); None = todos
+        total_shards (int): Número total de shards
+
+    Returns:
+        bool: True se o ticker deve ser processado pelo shard
+    """
+    if shard is None or not total_shards or total_shards <= 1:
+        return True
+    return zlib.crc32(ticker.encode('utf-8')) % total_shards == shard
+
+
+class UniversoAtivos:
+    def __init__(self, supabase, ttl_segundos=UNIVERSO_TTL):
+        """
+        Registro do universo de ativos (fonte, ticker RTD, fator de escala e habilitação),
+        carregado da tabela 'ativos' e mantido em cache
+
+        Args:
+            supabase: Cliente Supabase inicializado
+            ttl_segundos (int): Tempo de vida do cache em segundos
+        """
+        self.supabase = supabase
+        self.ttl_segundos = ttl_segundos
+        self._ativos = []
+        self._carregado_em = 0
+        self._lock = threading.Lock()
+
+    def carregar(self, forcar=False):
+        """
+        Retorna o universo de ativos, relendo a tabela 'ativos' apenas se o cache expirou
+
+        Args:
+            forcar (bool): Se True, ignora o cache e relê a tabela
+
+        Returns:
+            list: Lista de ativos normalizados
+        """
+        with self._lock:
+            if not forcar and self._ativos and time.time() - self._carregado_em < self.ttl_segundos:
+                return self._ativos
+
+            registros = []
+            if self.supabase:
+                try:
+                    response = self.supabase.table('ativos').select('*').execute()
+                    registros = response.data or []
+                except Exception as e:
+                    print(f"⚠️ Erro ao carregar universo de ativos: {str(e)}")
+                    # Manter a última versão conhecida em caso de falha
+                    if self._ativos:
+                        return self._ativos
+
+            # Tabela vazia: usar os ativos padrão para a carga inicial
+            if not registros:
+                registros = [dict(padrao, ticker=ticker) for ticker, padrao in PADROES_UNIVERSO.items()]
+
+            self._ativos = [self._normalizar(registro) for registro in registros]
+            self._carregado_em = time.time()
+            return self._ativos
+
+    def invalidar(self):
+        """Força a releitura da tabela na próxima consulta"""
+        with self._lock:
+            self._carregado_em = 0
+
+    def ativos(self, fonte=None, apenas_habilitados=True, shard=None, total_shards=None):
+        """
+        Filtra o universo de ativos
+
+        Args:
+            fonte (str): Fonte dos dados históricos ('yahoo', 'bcb'); None = todas
+            apenas_habilitados (bool): Se True, exclui ativos com habilitado = false
+            shard (int): Índice do shard a processar; None = todos
+            total_shards (int): Número total de shards
+
+        Returns:
+            list: Lista de ativos normalizados
+        """
+        return [
+            ativo for ativo in self.carregar()
+            if (fonte is None or ativo['fonte'] == fonte)
+            and (not apenas_habilitados or ativo['habilitado'])
+            and pertence_ao_shard(ativo['ticker'], shard, total_shards)
+        ]
+
+    def ativos_rtd(self, shard=None, total_shards=None):
+        """Retorna os ativos habilitados que possuem cotação na API RTD"""
+        return [ativo for ativo in self.ativos(shard=shard, total_shards=total_shards) if ativo['ticker_rtd']]
+
+    def por_ticker(self, ticker):
+        """Retorna o ativo normalizado de um ticker do banco ou None"""
+        for ativo in self.carregar():
+            if ativo['ticker'] == ticker:
+                return ativo
+        return None
+
+    @staticmethod
+    def _normalizar(registro):
+        """Completa um registro da tabela 'ativos' com os campos do universo"""
+        ticker = registro['ticker']
+        padrao = PADROES_UNIVERSO.get(ticker, {})
+
+        def campo(nome, valor_padrao):
+            valor = registro.get(nome)
+            if valor is None:
+                valor = padrao.get(nome, valor_padrao)
+            return valor
+
+        ativo = dict(registro)
+        ativo['nome'] = campo('nome', ticker)
+        ativo['fonte'] = campo('fonte', 'yahoo')
+        ativo['classe'] = campo('classe', 'etf')
+        ativo['fator_escala'] = float(campo('fator_escala', 1.0))
+        ativo['habilitado'] = bool(campo('habilitado', True))
+
+        # ticker_rtd ausente da tabela: usar o padrão conhecido ou a regra geral
+        if 'ticker_rtd' in registro and registro['ticker_rtd'] is not None:
+            ativo['ticker_rtd'] = registro['ticker_rtd']
+        elif ticker in PADROES_UNIVERSO:
+            ativo['ticker_rtd'] = padrao.get('ticker_rtd')
+        else:
+            ativo['ticker_rtd'] = ticker_rtd_padrao(ticker)
+
+        return ativo